@@ -0,0 +1,144 @@
+import numpy as np
+
+class AisleGraph:
+    def __init__(self, coords, aisles_x, h=4.5):
+        """
+        Graph of the aisles of a layout with any number of rows, built from the central locations of
+        the positions (e.g. PickingObj.registry.coords):
+        - rows: distinct y values, the first and last rows are h high and picked from one side,
+          the rows in between are back to back (2h high) and picked from both sides
+        - corridors: horizontal aisles between two rows, in the middle of the gap between their faces
+        - vertical aisles at aisles_x, connecting the corridors
+        The nodes are the crossings of the corridors and the vertical aisles, the shortest paths between
+        all of them are calculated once (self.getShortestPaths()), and a position reaches the nodes of
+        its corridor along the corridor (|x - aisle|), added at each lookup
+        For the 3 rows of "layout.csv" the distances are the same as Route.getRoute()
+        :param coords: array (n, 2) of central locations [x, y], nan for positions without location
+        :param aisles_x: x-coordinates of vertical aisles
+        :param h: height of pallet position (Route.h)
+        """
+        coords = np.asarray(coords, dtype=float)
+        located = ~np.isnan(coords).any(axis=1)
+        self.aisles_x = np.unique(np.asarray(aisles_x, dtype=float)) # x of the nodes
+        self.rows = np.unique(coords[located, 1])                    # y of each row
+        if len(self.rows) < 2:
+            raise ValueError('the layout needs at least two rows of positions to have an aisle')
+
+        # Faces of the rows: bottom and top of each pallet
+        nRows = len(self.rows)
+        halfHeights = np.full(nRows, h)
+        halfHeights[[0, -1]] = h/2
+        tops = self.rows + halfHeights
+        bottoms = self.rows - halfHeights
+        self.corridors = (tops[:-1] + bottoms[1:]) / 2 # y of corridor c, between row c and row c+1
+
+        # Side 0: face below, to corridor row-1; side 1: face above, to corridor row
+        # faceCost[row, side]: distance from the pallet to its corridor (inf if no corridor on that side)
+        self.faceCorridor = np.stack([np.arange(nRows) - 1, np.arange(nRows)], axis=1)
+        self.faceCost = np.full((nRows, 2), np.inf)
+        self.faceCost[1:, 0] = bottoms[1:] - self.corridors
+        self.faceCost[:-1, 1] = self.corridors - tops[:-1]
+        self.minStub = np.min(self.faceCost)
+
+        # Update through self.getShortestPaths()
+        self.dist = None # dist[node1, node2]: shortest distance, node = corridor * len(aisles_x) + index of aisle
+
+    def getShortestPaths(self):
+        """
+        All pairs shortest paths of the nodes (Floyd-Warshall, one row/column of updates at a time)
+        :return: array (N, N) of distances, calculated only once
+        """
+        if self.dist is not None:
+            return self.dist
+        nA, nC = len(self.aisles_x), len(self.corridors)
+        N = nA * nC
+        dist = np.full((N, N), np.inf)
+        np.fill_diagonal(dist, 0)
+        # Along the corridors, between two aisles next to each other
+        for c in range(nC):
+            nodes = c * nA + np.arange(nA - 1)
+            dist[nodes, nodes + 1] = dist[nodes + 1, nodes] = np.diff(self.aisles_x)
+        # Along the vertical aisles
+        ia = np.arange(nA)
+        for c in range(nC - 1):
+            dist[c * nA + ia, (c+1) * nA + ia] = dist[(c+1) * nA + ia, c * nA + ia] = \
+                self.corridors[c+1] - self.corridors[c]
+        for k in range(N):
+            np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+        self.dist = dist
+        return dist
+
+    def getDistances(self, pos1, pos2):
+        """
+        Same as PickingObj._getDistances(), from the shortest paths:
+        - fork pairs (exactly one of them picked from both sides, in different rows) start from that
+          one, and dist[forkLoc] is the distance from its side forkLoc (0: below, 1: above)
+        - otherwise the distance is the shortest over the sides of both positions
+        :param pos1, pos2: arrays (m, 2) of central locations
+        :return: dist: array (2, m) of distances for forkLoc = 0/1, isFork: array (m,)
+        """
+        dist = self.getShortestPaths()
+        pos1, pos2 = np.asarray(pos1, dtype=float), np.asarray(pos2, dtype=float)
+        m = len(pos1)
+        located = ~(np.isnan(pos1).any(axis=1) | np.isnan(pos2).any(axis=1))
+        nA, nC = len(self.aisles_x), len(self.corridors)
+        x1, x2 = pos1[:, 0], pos2[:, 0]
+        # A position leaves (or enters) its corridor by one of the two aisles next to it: going on along
+        # the corridor to a farther aisle is never shorter than leaving by the nearer one on the way
+        aisles1 = self._getNextAisles(x1)
+        aisles2 = self._getNextAisles(x2)
+        row1 = np.searchsorted(self.rows, np.where(located, pos1[:, 1], self.rows[0]))
+        row2 = np.searchsorted(self.rows, np.where(located, pos2[:, 1], self.rows[0]))
+
+        # legs[side1, side2]: distance from side1 of pos1 to side2 of pos2 (inf if a side has no face)
+        legs = np.full((2, 2, m), np.inf)
+        for side1 in [0, 1]:
+            c1 = self.faceCorridor[row1, side1]
+            for side2 in [0, 1]:
+                c2 = self.faceCorridor[row2, side2]
+                ok = (c1 >= 0) & (c1 < nC) & (c2 >= 0) & (c2 < nC)
+                cc1, cc2 = c1[ok], c2[ok]
+                # Straight along the same corridor, or out of it by aisle a and into the other by aisle b
+                d = np.where(cc1 == cc2, np.abs(x1[ok] - x2[ok]), np.inf)
+                for a in aisles1:
+                    for b in aisles2:
+                        a_, b_ = a[ok], b[ok]
+                        d = np.minimum(d, np.abs(x1[ok] - self.aisles_x[a_]) + dist[cc1 * nA + a_, cc2 * nA + b_] +
+                                       np.abs(self.aisles_x[b_] - x2[ok]))
+                legs[side1, side2, ok] = self.faceCost[row1[ok], side1] + d + self.faceCost[row2[ok], side2]
+
+        twoSided1 = np.isfinite(self.faceCost[row1]).all(axis=1)
+        twoSided2 = np.isfinite(self.faceCost[row2]).all(axis=1)
+        isFork = (twoSided1 != twoSided2) & (row1 != row2) & located
+        fromPos1 = legs.min(axis=1)        # [side1, m]
+        fromPos2 = legs.min(axis=0)        # [side2, m]
+        shortest = fromPos1.min(axis=0)
+        out = np.where(isFork, np.where(twoSided1, fromPos1, fromPos2), shortest)
+        out[:, ~located] = np.nan
+        return out, isFork
+
+    def _getNextAisles(self, xs):
+        # Indices of the aisles on the left and on the right of each x (the same one at the ends)
+        nA = len(self.aisles_x)
+        if nA == 0:
+            return ()
+        xs = np.nan_to_num(xs)
+        left = np.clip(np.searchsorted(self.aisles_x, xs, side='right') - 1, 0, nA - 1)
+        right = np.clip(np.searchsorted(self.aisles_x, xs, side='left'), 0, nA - 1)
+        return left, right
+
+
+if __name__ == '__main__':
+    import time
+    from PickingObj import PickingObj
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    start = time.time()
+    graph = AisleGraph(pko.registry.coords, pko.aisles_x)
+    graph.getShortestPaths()
+    print(len(graph.dist), 'nodes', round(time.time() - start, 3), 's')
+    pos = pko.registry.coords
+    idx1, idx2 = np.triu_indices(len(pos), k=1)
+    d0, fork0 = pko._getDistances(pos[idx1], pos[idx2], pko.ybot, pko.ytop)
+    d1, fork1 = graph.getDistances(pos[idx1], pos[idx2])
+    print('same as Route:', np.array_equal(d0, d1) and np.array_equal(fork0, fork1))
@@ -0,0 +1,146 @@
+import heapq
+import numpy as np
+
+class BatchRoute:
+    def __init__(self, pko):
+        """
+        Batches of positions picked in one route (at most 5 layers), and their optimal routes
+        :param pko: object created from (Class: PickingObj), with pair distances calculated
+        """
+        self.pko = pko
+        self.isMid = pko.registry.coords[:, 1] == (pko.ybot+pko.ytop)/2 # isMid[ID]: True if in the middle line
+
+        # Optimal routes memoized by region and (sorted) IDs of the batch: {(cls, IDs): (distance, route)}
+        # pair distances never change, so a batch repeated in another day is not solved again
+        self.routes = {}
+
+    def buildBatches(self, cls, ids, layers, nNear=10):
+        """
+        Savings based batching: start from one batch per position, then merge the two batches whose
+        merged route (self.getRoute()) adds the least distance to their own routes, as long as their
+        layers are at most 5 in total, i.e. save a route at the real cost of the merged route
+        (not only the shortest connection between the two batches, which may be far longer as a route)
+        :param cls: region of the positions
+        :param ids: IDs of positions (see pko.registry)
+        :param layers: layers to be picked of each position (1 to 4)
+        :param nNear: a batch is only merged with the batches of the nNear nearest positions of its positions
+        :return: list of batches, each as a list of indices of ids, ordered by their first position
+        """
+        ids = np.asarray(ids, dtype=int)
+        layers = np.asarray(layers)
+        id1, id2, forkLoc, distance = self.pko.getPairArraysAmong(cls, ids)
+        localIdx = dict(zip(ids.tolist(), range(len(ids))))
+        l1 = np.array([localIdx[i] for i in id1.tolist()], dtype=int)
+        l2 = np.array([localIdx[i] for i in id2.tolist()], dtype=int)
+
+        # Nearest positions of each position, by the shortest distance of the pair
+        near = [[] for _ in range(len(ids))]
+        for k in np.argsort(distance, kind='stable').tolist():
+            if not np.isfinite(distance[k]):
+                break
+            for i, j in [(l1[k], l2[k]), (l2[k], l1[k])]:
+                if len(near[i]) < nNear and j not in near[i]:
+                    near[i].append(j)
+
+        batch = list(range(len(ids)))            # batch[i]: batch of position i (index of its first position)
+        members = [[i] for i in range(len(ids))] # members[b]: positions of batch b
+        total = layers.tolist()                  # total[b]: layers of batch b
+        cost = [0.0] * len(ids)                  # cost[b]: distance of the route of batch b
+        version = [0] * len(ids)                 # version[b]: changed every time batch b is merged
+
+        # Merges (saving, version of b1, version of b2, b1, b2), the least distance added first,
+        # a merge is dropped when popped if one of its batches has changed since
+        heap = [(distance[k], 0, 0, min(l1[k], l2[k]), max(l1[k], l2[k])) for k in range(len(distance))
+                if np.isfinite(distance[k]) and layers[l1[k]] + layers[l2[k]] <= 5]
+        heapq.heapify(heap)
+        while len(heap) > 0:
+            added, v1, v2, b1, b2 = heapq.heappop(heap)
+            if version[b1] != v1 or version[b2] != v2 or len(members[b1]) == 0 or len(members[b2]) == 0:
+                continue
+            merged = sorted(members[b1] + members[b2])
+            cost[b1] = self.getRoute(cls, ids[merged])[0]
+            for i in members[b2]:
+                batch[i] = b1
+            members[b1], members[b2] = merged, []
+            total[b1] += total[b2]
+            version[b1] += 1
+            version[b2] += 1
+
+            # Merges of the new batch with the batches of its nearest positions
+            for b in sorted({batch[j] for i in merged for j in near[i]} - {b1}):
+                if total[b1] + total[b] > 5:
+                    continue
+                d = self.getRoute(cls, ids[members[b1] + members[b]])[0]
+                if np.isfinite(d):
+                    heapq.heappush(heap, (d - cost[b1] - cost[b], version[min(b, b1)], version[max(b, b1)],
+                                          min(b, b1), max(b, b1)))
+        return [m for m in members if len(m) > 0]
+
+    def getRoute(self, cls, ids):
+        """
+        Optimal route through all the positions of a batch (Held-Karp DP over subsets),
+        the route is the path of legs with the least total distance, where
+        - a leg between a position in the middle line and one in another line is on one side
+          of the middle position (forkLoc = 0 bottom, 1 top)
+        - two legs at the same middle position are on the same side of it
+        :param cls: region of the positions
+        :param ids: IDs of positions (see pko.registry)
+        :return:
+            distance: total distance of the route (inf if the positions could not be connected)
+            route: list of legs in the same format as (Class: Picking).Routes:
+                   [[name1, name2, forkLoc(-1 if not a fork pair), distance], ...]
+        """
+        key = (cls, tuple(sorted(int(i) for i in ids)))
+        if key not in self.routes:
+            self.routes[key] = self._solve(cls, np.array(key[1], dtype=int))
+        return self.routes[key]
+
+    def _solve(self, cls, ids):
+        pko = self.pko
+        names = pko.registry.names
+        k = len(ids)
+        if k < 2:
+            return 0, []
+        r = pko.regionIndex[ids]
+        r1, r2 = np.repeat(r, k), np.tile(r, k)
+        dist, isFork = pko.getRegionDistances(cls, r1, r2)
+        dist = np.where(np.isnan(dist), np.inf, dist).reshape(2, k, k).tolist()
+        isFork = isFork.reshape(k, k).tolist()
+        isMid = self.isMid[ids].tolist()
+
+        # dp[visited][(last, side)] = (distance, previous state, forkLoc of the last leg)
+        # side: side of the last position if it is in the middle line and already reached by a fork leg, else -1
+        full = (1 << k) - 1
+        dp = [{} for _ in range(full + 1)]
+        for i in range(k):
+            dp[1 << i][(i, -1)] = (0, None, -1)
+        for visited in range(1, full):
+            for (last, side), (cost, _, _) in dp[visited].items():
+                for j in range(k):
+                    if visited & (1 << j):
+                        continue
+                    if isFork[last][j]:
+                        options = [f for f in (0, 1) if not (isMid[last] and side not in (-1, f))]
+                    else:
+                        options = [-1]
+                    for f in options:
+                        newSide = (f if isFork[last][j] else side) if isMid[j] else -1
+                        newCost = cost + dist[max(f, 0)][last][j]
+                        states = dp[visited | (1 << j)]
+                        if (j, newSide) not in states or newCost < states[(j, newSide)][0]:
+                            states[(j, newSide)] = (newCost, (visited, last, side), f)
+
+        best = min(dp[full], key=lambda s: dp[full][s][0])
+        if not np.isfinite(dp[full][best][0]):
+            return np.inf, []
+        distance = dp[full][best][0]
+        route = []
+        state = (full,) + best
+        while dp[state[0]][state[1:]][1] is not None:
+            cost, prev, f = dp[state[0]][state[1:]]
+            i, j = prev[1], state[1]
+            if r[i] > r[j]:
+                i, j = j, i # names of a leg are in the order of the region, just like posPairs
+            route.append([str(names[ids[i]]), str(names[ids[j]]), f, dist[max(f, 0)][i][j]])
+            state = prev
+        return distance, route[::-1]
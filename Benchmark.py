@@ -0,0 +1,141 @@
+import json
+import os
+import platform
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from PickingObj import PickingObj
+from Picking import Picking
+
+class Benchmark:
+    # Geometry of the synthetic layouts, same as layout.csv
+    pitch = 4.5                   # distance between two neighbouring positions
+    rows_y = [2.25, 21.0, 39.75]  # y of bottom, middle and top line
+
+    def __init__(self, sizes=(100, 300, 1000), nAisles=2, nDays=3, linesPerDay=80, seed=0, ifPlot=False):
+        """
+        :param sizes: numbers of pallet positions of the synthetic layouts
+        :param nAisles: number of vertical aisles (also the boundaries of regions)
+        :param nDays: number of synthetic days of orders picked for each size
+        :param linesPerDay: number of positions to be picked per day (at most the number of positions)
+        :param ifPlot: also time the plotting of the layout
+        """
+        self.sizes = sizes
+        self.nAisles = nAisles
+        self.nDays = nDays
+        self.linesPerDay = linesPerDay
+        self.seed = seed
+        self.ifPlot = ifPlot
+        self.results = []
+
+    def makeLayout(self, fileDir, nPositions):
+        """
+        Write a synthetic layout in the format of layout.csv:
+        positions spread evenly over the three lines, leaving space for nAisles vertical aisles
+        :return: x of the aisles
+        """
+        perRow = int(np.ceil(nPositions / len(self.rows_y)))
+        # one position slot is left empty for every 10 positions, and 3 slots for each aisle
+        length = (perRow + perRow // 10 + 3 * self.nAisles) * self.pitch
+        aisles_x = [length * (i + 1) / (self.nAisles + 1) for i in range(self.nAisles)]
+        aisles_x = [np.round(x / self.pitch) * self.pitch for x in aisles_x]
+
+        slots = np.arange(int(length / self.pitch)) * self.pitch + self.pitch / 2
+        nearAisle = np.min(np.abs(slots[:, None] - np.array(aisles_x)), axis=1) < self.pitch * 1.5
+        slots = slots[~nearAisle & (np.arange(len(slots)) % 11 != 10)][:perRow]
+
+        xs = np.tile(slots, len(self.rows_y))[:nPositions]
+        ys = np.repeat(self.rows_y, len(slots))[:nPositions]
+        names = ['SYN' + str(i).zfill(6) for i in range(nPositions)]
+        pd.DataFrame({'PosName': names, 'Loc_x': xs, 'Loc_y': ys}).to_csv(fileDir, index=False)
+        return aisles_x
+
+    def makeOrders(self, pko, rng):
+        """
+        Synthetic orders of self.nDays days, in the format used by (Class: Picking)
+        """
+        dfs = []
+        for day in range(self.nDays):
+            locs = rng.choice(pko.posKeys, size=min(self.linesPerDay, len(pko.posKeys)), replace=False)
+            df = pd.DataFrame({'date': 'day' + str(day), 'Location': locs,
+                               'layers': rng.integers(1, 13, size=len(locs))})
+            df['Class'] = df['Location'].map(pko.posClsDict)
+            dfs.append(df)
+        return dfs
+
+    def run(self, outputFileDir=None):
+        """
+        Time each stage for each size of layout
+        :param outputFileDir: .jsonl file to which the results are appended (None: not saved)
+        :return: (pd.DataFrame) | size | stage | seconds |
+        """
+        rng = np.random.default_rng(self.seed)
+        self.results = []
+        with tempfile.TemporaryDirectory() as tmpDir:
+            for size in self.sizes:
+                layoutFileDir = os.path.join(tmpDir, 'layout_' + str(size) + '.csv')
+                aisles_x = self.makeLayout(layoutFileDir, size)
+
+                start = time.perf_counter()
+                pko = PickingObj(aisles_x=aisles_x, layoutFileDir=layoutFileDir, bondAisles_x=aisles_x)
+                pko.getPosClass()
+                self._record(size, 'layout load', start)
+
+                start = time.perf_counter()
+                pko.getPairDistance()
+                self._record(size, 'pair distance', start, pairs=int(sum(len(p) for p in pko.posPairs)))
+
+                dfs = self.makeOrders(pko, rng)
+                start = time.perf_counter()
+                for df in dfs:
+                    for cls in range(len(pko.regionIds)):
+                        pko.getPairArraysAmong(cls, pko.registry.getIds(df['Location'][df['Class'] == cls]))
+                self._record(size, 'pair filtering', start, days=self.nDays)
+
+                start = time.perf_counter()
+                pks = []
+                for df in dfs:
+                    pk = Picking(pko, df)
+                    pk.picking()
+                    pks.append(pk)
+                self._record(size, 'batching', start, days=self.nDays)
+
+                # The route table is built again (it is also built by pk.picking()), so that the stage is
+                # the table and the travel distance from it, not only the sum of a table already built
+                start = time.perf_counter()
+                for pk in pks:
+                    pk.routeTable = pk.getRouteTable()
+                    pk.getTravelDistance()
+                self._record(size, 'travel distance', start, days=self.nDays)
+
+                if self.ifPlot:
+                    import matplotlib
+                    matplotlib.use('Agg')
+                    import matplotlib.pyplot as plt
+                    start = time.perf_counter()
+                    pko.Route.palletPos.PlotLayout()
+                    plt.close('all')
+                    self._record(size, 'plot layout', start)
+
+        if outputFileDir is not None:
+            self.save(outputFileDir)
+        return pd.DataFrame(self.results)[['size', 'stage', 'seconds']]
+
+    def _record(self, size, stage, start, **info):
+        self.results.append(dict(size=size, stage=stage, seconds=time.perf_counter() - start, **info))
+
+    def save(self, outputFileDir):
+        # One json object per line, so results of different runs (versions) could be compared over time
+        run = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+               'numpy': np.__version__, 'pandas': pd.__version__, 'nAisles': self.nAisles,
+               'nDays': self.nDays, 'linesPerDay': self.linesPerDay, 'seed': self.seed}
+        with open(outputFileDir, 'a') as f:
+            for result in self.results:
+                f.write(json.dumps(dict(run, **result)) + '\n')
+
+
+if __name__ == '__main__':
+    import sys
+    outputFileDir = sys.argv[1] if len(sys.argv) > 1 else 'benchmark.jsonl'
+    print(Benchmark().run(outputFileDir).to_string())
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+class TravelEstimator:
+    def __init__(self, pko, scale=1.0):
+        """
+        Estimate the travel distance of a day (Picking.travelDistance) from its pick list and the pair
+        distances, without building the routes, for screening many scenarios before exact evaluation
+        Only the layers left after the 5-layer routes (layers % 5) are batched, into routes of at most
+        5 layers, whose legs connect two positions of the same route:
+        - lower: each position paired (all the positions of at most 2 layers, but one, see
+          Picking._pairPicking()) has a leg at least as long as its nearest position it could be batched
+          with, and each leg is counted by at most two positions
+        - upper: with the routes as trees, each position but one per route has its own leg, at most as
+          long as its farthest position it could be batched with, and at most 4/5 of them have one
+        - approx: as many legs as positions minus the routes needed for their layers, each one
+          as long as the nearest position, times self.scale (see self.calibrate())
+        :param pko: object created from (Class: PickingObj), with pair distances calculated
+        :param scale: factor of the approximation
+        """
+        self.pko = pko
+        self.scale = scale
+
+    def estimate(self, df):
+        """
+        :param df: (pd.DataFrame) pick list of a day with the columns 'Location', 'layers' and
+            'Class'(optional), the same as for (Class: Picking)
+        :return: (dict) lower, approx, upper: estimates of the travel distance
+        """
+        if 'Class' not in df.columns:
+            df = df.assign(Class=df['Location'].map(self.pko.posClsDict))
+        # Layers left after step (2), one entry per position (the last one), same as step (3) of Picking
+        df = df[df['Class'].notna() & (df['layers'] % 5 > 0)].drop_duplicates('Location', keep='last')
+        ids = self.pko.registry.getIds(df['Location'].values)
+        return self.estimateArrays(ids, df['layers'].values, df['Class'].values)
+
+    def estimateArrays(self, ids, layers, classes=None):
+        """
+        Same as self.estimate(), e.g. from OrderStore.getDay()
+        :param ids: IDs of positions (see pko.registry), each at most once, -1 if not in the layout
+        :param layers: layers to be picked of each position
+        :param classes: regions of the positions (None: pko.posCls)
+        """
+        ids = np.asarray(ids, dtype=int)
+        left = np.asarray(layers, dtype=int) % 5
+        classes = self.pko.posCls[ids] if classes is None else np.asarray(classes)
+        # Positions not in the layout (-1) or not in their region are picked alone, without legs
+        located = (ids >= 0) & (self.pko.posCls[ids] == classes)
+        ids, left, classes = ids[located], left[located], classes[located]
+        lower = approx = upper = 0.0
+        for cls in np.unique(classes[left > 0]).astype(int).tolist():
+            mask = (classes == cls) & (left > 0)
+            l, u, x = self._estimateRegion(cls, ids[mask], left[mask])
+            lower, upper, approx = lower + l, upper + u, approx + x
+        return {'lower': lower, 'approx': self.scale * approx, 'upper': upper}
+
+    def _estimateRegion(self, cls, ids, left):
+        n = len(ids)
+        if n < 2:
+            return 0.0, 0.0, 0.0
+        r = self.pko.regionIndex[ids]
+        idx1, idx2 = np.divmod(np.arange(n * n), n)
+        dist, isFork = self.pko.getRegionDistances(cls, r[idx1], r[idx2])
+        # Legs without location (nan) are not counted in the travel distance
+        dist = np.nan_to_num(dist, nan=0.0)
+        near = np.min(dist, axis=0).reshape(n, n)
+        far = np.max(dist, axis=0).reshape(n, n)
+        batchable = (left[:, None] + left[None, :] <= 5) & ~np.eye(n, dtype=bool)
+        near = np.where(batchable, near, np.inf).min(axis=1)
+        far = np.where(batchable, far, -np.inf).max(axis=1)
+        paired = batchable.any(axis=1)
+        nPaired = int(np.sum(paired))
+        if nPaired < 2:
+            return 0.0, 0.0, 0.0
+
+        # Positions of at most 2 layers could be batched with each other, only one of them may be left alone
+        small = near[paired & (left <= 2)]
+        lower = (np.sum(small) - np.max(small)) / 2 if len(small) > 0 else 0.0
+        far = np.sort(far[paired])[::-1]
+        upper = np.sum(far[:nPaired - int(np.ceil(nPaired / 5))])
+        nLegs = max(nPaired - int(np.ceil(np.sum(left[paired]) / 5)), 0)
+        approx = np.sum(np.sort(near[paired])[:nLegs])
+        return float(lower), float(upper), float(approx)
+
+    def calibrate(self, days, engine='array'):
+        """
+        Compare the estimates with the exact travel distances of (Class: Picking) on some days,
+        and set self.scale to the least squares factor of the approximation
+        :param days: iterable of pick lists (pd.DataFrame), e.g. OrderStream.readDays()
+        :return: report: (pd.DataFrame) | date | lower | approx | upper | exact | error |,
+            summary: (dict) scale, mean absolute error (relative), rank correlation,
+            coverage (share of days with lower <= exact <= upper)
+        """
+        from Picking import Picking
+        scale, self.scale = self.scale, 1.0
+        rows = []
+        for i, df in enumerate(days):
+            estimate = self.estimate(df)
+            pk = Picking(self.pko, df, engine)
+            pk.picking()
+            date = df['date'].iloc[0] if 'date' in df.columns and len(df) > 0 else i
+            rows.append([date, estimate['lower'], estimate['approx'], estimate['upper'], pk.travelDistance])
+        report = pd.DataFrame(rows, columns=['date', 'lower', 'approx', 'upper', 'exact'])
+
+        x, y = report['approx'].values, report['exact'].values
+        self.scale = float(x @ y / (x @ x)) if x @ x > 0 else scale
+        report['approx'] *= self.scale
+        report['error'] = (report['approx'] - report['exact']) / report['exact'].where(report['exact'] > 0)
+        summary = {'scale': self.scale,
+                   'mean absolute error': float(report['error'].abs().mean()),
+                   'rank correlation': float(report['approx'].rank().corr(report['exact'].rank())),
+                   'coverage': float(np.mean((report['lower'] <= report['exact'] + 1e-9) &
+                                             (report['exact'] <= report['upper'] + 1e-9)))}
+        return report, summary
+
+
+if __name__ == '__main__':
+    import time
+    from PickingObj import PickingObj
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rng = np.random.default_rng(0)
+    days = []
+    for d in range(20):
+        k = rng.integers(20, 120)
+        df = pd.DataFrame({'Location': rng.choice(pko.posKeys, size=k, replace=False),
+                           'layers': rng.integers(1, 13, size=k), 'date': d})
+        df['Class'] = df['Location'].map(pko.posClsDict)
+        days.append(df)
+    estimator = TravelEstimator(pko)
+    report, summary = estimator.calibrate(days)
+    print(report.to_string(index=False))
+    print(summary)
+    start = time.time()
+    for df in days:
+        estimator.estimate(df)
+    print('estimate', round((time.time() - start) / len(days) * 1000, 2), 'ms per day')
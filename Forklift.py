@@ -0,0 +1,123 @@
+import heapq
+import numpy as np
+import pandas as pd
+
+class ForkliftSimulation:
+    def __init__(self, pko, nForklifts=2, speed=1.0, pickTime=0.0):
+        """
+        Discrete-event simulation of forklifts driving the planned routes, where each vertical aisle
+        (pko.aisles_x) could only be crossed by one forklift at a time
+        :param pko: object created from (Class: PickingObj)
+        :param nForklifts: number of forklifts
+        :param speed: distance travelled per unit of time
+        :param pickTime: time to pick one layer
+        """
+        self.pko = pko
+        self.nForklifts = nForklifts
+        self.speed = speed
+        self.pickTime = pickTime
+
+        # Update through self.run()
+        self.forklifts = None # (pd.DataFrame) | forklift | routes | busy time | wait time | utilization |
+        self.aisleWait = None # aisleWait[k]: time waited for aisle k
+
+    def getSegments(self, route, layers=0):
+        """
+        Split a route into segments: travel outside the aisles, crossing of an aisle, and picking
+        :param route: a route of (Class: Picking).Routes
+        :param layers: layers picked by the route
+        :return: list of (duration, aisle), aisle = -1 if no aisle is occupied
+        """
+        pko = self.pko
+        Route = pko.Route
+        aisles = list(pko.aisles_x)
+        segments = []
+        for leg in route:
+            if len(leg) < 4:
+                continue # [['Position']]: picked alone
+            points = np.array(Route.getLegPoints(leg, pko.positions, pko.ybot, pko.ytop), dtype=float)
+            if np.isnan(points).any():
+                continue # position without location, not counted in the travel distance either
+            if len(points) == 6:
+                # [p1, p2, p3, pm3, pm2, pm1]: p3 -> pm3 is in the aisle
+                k = aisles.index(points[2, 0])
+                segments.append((Route.calculateRoute(points[:3]) / self.speed, -1))
+                segments.append((Route.calculateRoute(points[2:4]) / self.speed, k))
+                segments.append((Route.calculateRoute(points[3:]) / self.speed, -1))
+            else:
+                segments.append((Route.calculateRoute(points) / self.speed, -1))
+        segments.append((layers * self.pickTime, -1))
+        return segments
+
+    def run(self, Routes, Layers=None):
+        """
+        The routes are taken in order (region by region) by the first forklift available
+        :param Routes: (Class: Picking).Routes
+        :param Layers: layers of each route, e.g. (Class: Picking).getRouteLayers() (None: no picking time)
+        :return: (dict) makespan, utilization (mean of forklifts), wait time (total), routes
+        """
+        routes = [route for routesCls in Routes for route in routesCls]
+        layers = [l for layersCls in Layers for l in layersCls] if Layers is not None else [0] * len(routes)
+        queue = [self.getSegments(route, l) for route, l in zip(routes, layers)]
+
+        n = self.nForklifts
+        busy = np.zeros(n)
+        wait = np.zeros(n)
+        nRoutes = np.zeros(n, dtype=int)
+        aisleFree = np.zeros(len(self.pko.aisles_x)) # time when each aisle becomes free
+        self.aisleWait = np.zeros(len(self.pko.aisles_x))
+
+        # events: (time, forklift, index of route, index of segment), the forklift is ready for the segment
+        events = []
+        nextRoute = 0
+        for f in range(min(n, len(queue))):
+            heapq.heappush(events, (0.0, f, nextRoute, 0))
+            nextRoute += 1
+        makespan = 0.0
+        while events:
+            time, f, r, s = heapq.heappop(events)
+            segments = queue[r]
+            if s == len(segments):
+                # route finished, take the next one
+                nRoutes[f] += 1
+                makespan = max(makespan, time)
+                if nextRoute < len(queue):
+                    heapq.heappush(events, (time, f, nextRoute, 0))
+                    nextRoute += 1
+                continue
+            duration, aisle = segments[s]
+            if aisle >= 0:
+                if aisleFree[aisle] > time:
+                    # wait until the aisle is free, then ask again
+                    wait[f] += aisleFree[aisle] - time
+                    self.aisleWait[aisle] += aisleFree[aisle] - time
+                    heapq.heappush(events, (aisleFree[aisle], f, r, s))
+                    continue
+                aisleFree[aisle] = time + duration
+            busy[f] += duration
+            heapq.heappush(events, (time + duration, f, r, s + 1))
+
+        utilization = busy / makespan if makespan > 0 else np.zeros(n)
+        self.forklifts = pd.DataFrame({'forklift': np.arange(n), 'routes': nRoutes, 'busy time': busy,
+                                       'wait time': wait, 'utilization': utilization})
+        return {'makespan': makespan, 'utilization': float(np.mean(utilization)),
+                'wait time': float(np.sum(wait)), 'routes': len(queue)}
+
+
+if __name__ == '__main__':
+    import time
+    from PickingObj import PickingObj
+    from Picking import Picking
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'Location': rng.choice(pko.posKeys, size=150, replace=False),
+                       'layers': rng.integers(1, 13, size=150)})
+    df['Class'] = df['Location'].map(pko.posClsDict)
+    pk = Picking(pko, df)
+    pk.picking()
+    for nForklifts in [1, 2, 4, 8]:
+        start = time.time()
+        result = ForkliftSimulation(pko, nForklifts, speed=1.0, pickTime=30).run(pk.Routes, pk.getRouteLayers())
+        print(nForklifts, result, round(time.time() - start, 3), 's')
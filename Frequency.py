@@ -0,0 +1,99 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+from WarehouseObj import PalletPos
+
+class FrequencyTracker:
+    def __init__(self, pko, window=None):
+        """
+        Frequencies (layers picked) of the positions, updated day by day from the pick lists,
+        instead of the static snapshot "freq_post.csv"
+        :param pko: object created from (Class: PickingObj)
+        :param window: number of days of the rolling frequencies (None: all the days)
+        """
+        self.pko = pko
+        self.registry = pko.registry
+        self.window = window
+        n = len(self.registry)
+        self.counts = np.zeros(n, dtype=np.int64)        # counts[ID]: layers picked over all the days
+        self.windowCounts = np.zeros(n, dtype=np.int64)  # windowCounts[ID]: layers picked over the last days
+        self.days = deque()                              # (date, ids, layers) of the days in the window
+        self.nDays = 0
+
+    def addDay(self, df, date=None):
+        """
+        :param df: (pd.DataFrame) pick list of a day with the columns 'Location' and 'layers',
+            e.g. from OrderStream.readDays(), positions not in the layout are ignored
+        :param date: date of the day (None: df['date'] if any)
+        """
+        if date is None and 'date' in df.columns and len(df) > 0:
+            date = df['date'].iloc[0]
+        ids = self.registry.getIds(df['Location'].values)
+        layers = df['layers'].values.astype(np.int64)
+        self.addDayArrays(ids[ids >= 0], layers[ids >= 0], date)
+
+    def addDayArrays(self, ids, layers, date=None):
+        """
+        :param ids: IDs of positions (see pko.registry), e.g. from OrderStore.getDay()
+        :param layers: layers picked of each position
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        layers = np.asarray(layers, dtype=np.int64)
+        np.add.at(self.counts, ids, layers)
+        np.add.at(self.windowCounts, ids, layers)
+        self.days.append((date, ids, layers))
+        self.nDays += 1
+        # Days out of the window are taken out of the rolling counts
+        while self.window is not None and len(self.days) > self.window:
+            date, ids, layers = self.days.popleft()
+            np.subtract.at(self.windowCounts, ids, layers)
+        if self.window is None:
+            self.days.clear() # all the days are counted, no need to keep them
+
+    def getFrequencies(self, ifRolling=True):
+        # Array of frequencies aligned with the IDs of pko.registry
+        return self.windowCounts if ifRolling and self.window is not None else self.counts
+
+    def getFreqDict(self, ifRolling=True):
+        """
+        :return: {'Position': frequency} of the positions picked, same as PalletPos.freqDict
+        """
+        freqs = self.getFrequencies(ifRolling)
+        picked = np.flatnonzero(freqs > 0)
+        return dict(zip(self.registry.names[picked].tolist(), freqs[picked].tolist()))
+
+    def getClasses(self, n_classes=7, ifRolling=True):
+        """
+        Quantile classes of the positions picked, same as PalletPos.PlotHeatMap()
+        :return: array of classes aligned with the IDs, -1 for positions not picked
+        """
+        freqs = self.getFrequencies(ifRolling)
+        picked = freqs > 0
+        classes = np.full(len(freqs), -1)
+        if picked.any():
+            classes[picked] = PalletPos._divideIntoClasses(freqs[picked], n_classes)
+        return classes
+
+    def saveFrequency(self, fileDir='freq_post.csv', ifRolling=True):
+        """
+        Write the frequencies in the same format as "freq_post.csv", see PalletPos.ReadFrequencyFromCSV()
+        |Location   |numberOfLayersPicked|
+        |-----------|--------------------|
+        |801-01-A-01|379                 |
+        """
+        freqDict = self.getFreqDict(ifRolling)
+        df = pd.DataFrame({'Location': list(freqDict.keys()), 'numberOfLayersPicked': list(freqDict.values())})
+        df.to_csv(fileDir, index=False)
+        return df
+
+
+if __name__ == '__main__':
+    from PickingObj import PickingObj
+    from Orders import OrderStream
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    tracker = FrequencyTracker(pko, window=30)
+    for df in OrderStream(pko).readDays('order_data.csv'):
+        tracker.addDay(df)
+        print(df['date'].iloc[0], 'positions picked in the window', int((tracker.getFrequencies() > 0).sum()))
+    tracker.saveFrequency('freq_rolling.csv')
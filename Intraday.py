@@ -0,0 +1,126 @@
+import pandas as pd
+from Picking import Picking
+
+class IntradayPlanner:
+    def __init__(self, pko, engine='array', batching='greedy'):
+        """
+        Plan the routes of a day wave by wave: new orders (or cancellations) only re-plan
+        the regions they touch, and routes already committed (sent to forklifts) are kept
+        :param pko: object created from (Class: PickingObj), with pair distances calculated
+        :param engine: engine of (Class: Picking)
+        :param batching: batching of (Class: Picking)
+        """
+        self.pko = pko
+        self.engine = engine
+        self.batching = batching
+        nRegions = int(max(pko.posCls)+1)
+
+        # Per region cls:
+        self.pending = [{} for _ in range(nRegions)]    # pending[cls]: {'Position': layers not committed yet}
+        self.planned = [[] for _ in range(nRegions)]    # planned[cls]: [(route, {'Position': layers}), ...]
+        self.committed = [[] for _ in range(nRegions)]  # committed[cls]: [(route, {'Position': layers}), ...]
+        self.dirty = set()                              # regions to be re-planned
+
+    def addLines(self, df):
+        """
+        Add order lines of a new wave
+        :param df: (pd.DataFrame) with the columns 'Location', 'layers' and 'Class'(optional),
+            orders of locations not in the layout are ignored
+        :return: regions touched
+        """
+        touched = set()
+        for loc, layers, cls in self._getLines(df):
+            self.pending[cls][loc] = self.pending[cls].get(loc, 0) + layers
+            touched.add(cls)
+        self.dirty |= touched
+        return touched
+
+    def cancelLines(self, df):
+        """
+        Cancel order lines, only the layers not committed yet could be cancelled
+        :param df: (pd.DataFrame) with the columns 'Location', 'layers' and 'Class'(optional)
+        :return: layers cancelled
+        """
+        cancelled = 0
+        for loc, layers, cls in self._getLines(df):
+            left = self.pending[cls].get(loc, 0)
+            if left == 0:
+                continue
+            cancelled += min(layers, left)
+            if layers >= left:
+                del self.pending[cls][loc]
+            else:
+                self.pending[cls][loc] = left - layers
+            self.dirty.add(cls)
+        return cancelled
+
+    def plan(self):
+        """
+        Re-plan the pending layers of the regions changed since the last plan
+        :return: regions re-planned
+        """
+        replanned = sorted(self.dirty)
+        for cls in replanned:
+            pending = self.pending[cls]
+            df = pd.DataFrame({'Location': list(pending.keys()), 'layers': list(pending.values()), 'Class': cls})
+            pk = Picking(self.pko, df, self.engine, batching=self.batching)
+            routes = pk.pickRegion(cls)
+            self.planned[cls] = list(zip(routes, Picking.getRouteLoads(routes, pending.items())))
+        self.dirty = set()
+        return replanned
+
+    def commitRoutes(self, cls, n=None):
+        """
+        Commit (send to forklifts) the first n planned routes of region cls, they will not be re-planned
+        :param n: number of routes (None: all the planned routes)
+        :return: routes committed
+        """
+        if cls in self.dirty:
+            self.plan()
+        planned = self.planned[cls]
+        n = len(planned) if n is None else n
+        commits, self.planned[cls] = planned[:n], planned[n:]
+        for route, load in commits:
+            for loc, layers in load.items():
+                self.pending[cls][loc] -= layers
+                if self.pending[cls][loc] == 0:
+                    del self.pending[cls][loc]
+        self.committed[cls] += commits
+        return [route for route, load in commits]
+
+    def getRoutes(self):
+        """
+        :return: committed and then planned routes of all the regions, in the format of (Class: Picking).Routes
+        """
+        if len(self.dirty) > 0:
+            self.plan()
+        return [[route for route, load in committed + planned]
+                for committed, planned in zip(self.committed, self.planned)]
+
+    def getTravelDistance(self):
+        return sum(leg[3] for routes in self.getRoutes() for route in routes for leg in route if len(leg) > 1)
+
+    def _getLines(self, df):
+        # (Location, layers, Class) of the lines located in the layout, layers summed by location
+        if 'Class' not in df.columns:
+            df = df.assign(Class=df['Location'].map(self.pko.posClsDict))
+        df = df[df['Class'].notna() & (df['layers'] > 0)]
+        df = df.groupby('Location', sort=False, as_index=False).agg({'layers': 'sum', 'Class': 'first'})
+        return zip(df['Location'].tolist(), df['layers'].astype(int).tolist(), df['Class'].astype(int).tolist())
+
+
+if __name__ == '__main__':
+    import numpy as np
+    from PickingObj import PickingObj
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rng = np.random.default_rng(0)
+    planner = IntradayPlanner(pko)
+    for wave in range(4):
+        df = pd.DataFrame({'Location': rng.choice(pko.posKeys, size=50), 'layers': rng.integers(1, 13, size=50)})
+        planner.addLines(df)
+        print('wave', wave, 're-planned regions', planner.plan())
+        for cls in range(len(planner.planned)):
+            planner.commitRoutes(cls, n=len(planner.planned[cls]) // 2)
+    print('travel distance', planner.getTravelDistance())
@@ -0,0 +1,175 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from Orders import OrderStream
+
+class OrderStore:
+    # Columns of the order file, same as (Class: OrderStream)
+    skuCol = OrderStream.skuCol
+    categoryCol = OrderStream.categoryCol
+    dateCol = OrderStream.dateCol
+    layersCol = OrderStream.layersCol
+
+    def __init__(self, pko, dbFileDir='ISYE6335_proj.db', chunksize=100000, dateFormat=None):
+        """
+        Local SQLite store of the orders, with the same tables as the notebook:
+        - Orders: every order line loaded
+        - LayersDailyPicking: Shipped layers summed by date and SKU, updated as order files are appended
+        - Slotting: SKU of each location
+        and a table Positions (Location -> ID, Class) of the layout of pko, so that a day is joined in SQL
+        :param pko: object created from (Class: PickingObj), after pko.getPosClass()
+        :param dbFileDir: .db file (':memory:': not saved)
+        :param chunksize: number of order lines inserted at a time
+        :param dateFormat: format of the dates, e.g. '%A, %B %d, %Y' (None: inferred, slower)
+        """
+        self.pko = pko
+        self.chunksize = chunksize
+        self.dateFormat = dateFormat
+        self.db = sqlite3.connect(dbFileDir)
+        self._createTables()
+        self._loadPositions()
+
+    def _createTables(self):
+        with self.db:
+            self.db.executescript('''
+            Create table if not exists Orders (
+                `Material Number` Text,
+                `ORDERCATEGORY` Text,
+                `Pick Date` Text,
+                `Layers Ordered Rounded` Int
+            );
+            Create index if not exists Orders_date on Orders (`Pick Date`);
+            Create index if not exists Orders_SKU on Orders (`Material Number`);
+
+            Create table if not exists LayersDailyPicking (
+                `SKU_ID` Text,
+                `Count(layers)` Int(10),
+                `Pick Date` Text,
+                Primary key (`Pick Date`, `SKU_ID`)
+            );
+            Create index if not exists LayersDailyPicking_SKU on LayersDailyPicking (`SKU_ID`);
+
+            Create table if not exists Slotting (
+                `Location` Text,
+                `New Item` Text
+            );
+            Create index if not exists Slotting_SKU on Slotting (`New Item`);
+
+            Drop table if exists Positions;
+            Create table Positions (
+                `Location` Text Primary key,
+                `ID` Int,
+                `Class` Int
+            );
+            ''')
+
+    def _loadPositions(self):
+        # Positions of the current layout, the IDs are the ones of pko.registry
+        names = self.pko.registry.names.tolist()
+        with self.db:
+            self.db.executemany('Insert into Positions VALUES (?,?,?)',
+                                zip(names, range(len(names)), self.pko.posCls.astype(int).tolist()))
+
+    def loadOrders(self, fileDir):
+        """
+        Append an order file to Orders, chunk by chunk (one transaction per chunk),
+        and add its Shipped layers to LayersDailyPicking
+        :param fileDir: .csv file converted from "Jefferson_Order_Data.xlsx", see (Class: OrderStream)
+        :return: number of order lines loaded
+        """
+        n = 0
+        chunks = pd.read_csv(fileDir, chunksize=self.chunksize, dtype={self.skuCol: str},
+                             usecols=[self.skuCol, self.categoryCol, self.dateCol, self.layersCol])
+        for chunk in chunks:
+            dates = pd.to_datetime(chunk[self.dateCol], format=self.dateFormat, errors='coerce')
+            dates = dates.dt.strftime('%Y-%m-%d').fillna('0001-01-01')
+            layers = chunk[self.layersCol].fillna(0).astype(int)
+            shipped = (chunk[self.categoryCol] == 'Shipped').values & (layers.values > 0)
+            daily = pd.DataFrame({'SKU': chunk[self.skuCol].values[shipped], 'layers': layers.values[shipped],
+                                  'date': dates.values[shipped]})
+            daily = daily.groupby(['date', 'SKU'], as_index=False, sort=False)['layers'].sum()
+            with self.db:
+                self.db.executemany('Insert into Orders VALUES (?,?,?,?)',
+                                    zip(chunk[self.skuCol].tolist(), chunk[self.categoryCol].tolist(),
+                                        dates.tolist(), layers.tolist()))
+                self.db.executemany('''
+                Insert into LayersDailyPicking VALUES (?,?,?)
+                on conflict (`Pick Date`, `SKU_ID`)
+                do update set `Count(layers)` = `Count(layers)` + excluded.`Count(layers)`
+                ''', zip(daily['SKU'].tolist(), daily['layers'].tolist(), daily['date'].tolist()))
+            n += len(chunk)
+        return n
+
+    def loadSlotter(self, fileDir='Newest Slotter.csv'):
+        """
+        Replace the table Slotting, only real positions (with names longer than 4) are kept
+        :param fileDir: .csv file with the columns 'Location' and 'New Item' (SKU)
+        """
+        df = pd.read_csv(fileDir, usecols=['Location', 'New Item'], dtype=str)
+        df = df[df['Location'].str.len() > 4]
+        with self.db:
+            self.db.execute('Delete from Slotting')
+            self.db.executemany('Insert into Slotting VALUES (?,?)',
+                                zip(df['Location'].tolist(), df['New Item'].tolist()))
+        return len(df)
+
+    def getDays(self):
+        # Dates with layers to be picked, in order
+        return [row[0] for row in self.db.execute(
+            'Select distinct `Pick Date` from LayersDailyPicking order by `Pick Date`')]
+
+    def getDay(self, date):
+        """
+        Layers to be picked on a day, straight from the cursor into arrays
+        (SKUs without location in the layout are dropped)
+        :param date: 'yyyy-mm-dd'
+        :return: (ids, layers, classes) arrays, ids of pko.registry, in order of SKU
+        """
+        cur = self.db.execute('''
+        Select p.`ID`, l.`Count(layers)`, p.`Class`
+        from LayersDailyPicking l
+        join Slotting s on s.`New Item` = l.`SKU_ID`
+        join Positions p on p.`Location` = s.`Location`
+        where l.`Pick Date` = ?
+        order by l.`SKU_ID`, s.rowid
+        ''', (date,))
+        rows = np.fromiter((v for row in cur for v in row), dtype=np.int64)
+        rows = rows.reshape(-1, 3)
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+    def getDayFrame(self, date):
+        """
+        :return: (pd.DataFrame) the layers of a day, which could be used by (Class: Picking)
+            |layers|date      |Location   |Class|
+            |------|----------|-----------|-----|
+            |3     |2022-02-23|801-01-A-01|0    |
+        """
+        ids, layers, classes = self.getDay(date)
+        return pd.DataFrame({'layers': layers, 'date': date,
+                             'Location': self.pko.registry.names[ids], 'Class': classes})
+
+    def readDays(self):
+        # Same as OrderStream.readDays(), but from the store
+        for date in self.getDays():
+            df = self.getDayFrame(date)
+            if len(df) > 0:
+                yield df
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == '__main__':
+    from PickingObj import PickingObj
+    from Picking import Picking
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    store = OrderStore(pko, 'ISYE6335_proj.db', dateFormat='%A, %B %d, %Y')
+    store.loadSlotter('Newest Slotter.csv')
+    store.loadOrders('order_data.csv')
+    for df in store.readDays():
+        pk = Picking(pko, df)
+        pk.picking()
+        print(df['date'].iloc[0], pk.travelDistance)
+    store.close()
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+class OrderStream:
+    # Columns of the order file (converted from "Jefferson_Order_Data.xlsx")
+    skuCol = 'Material Number'
+    categoryCol = 'ORDERCATEGORY'
+    dateCol = 'OBD_DATE'
+    layersCol = 'Layers Ordered Rounded'
+
+    def __init__(self, pko, slotterFileDir='Newest Slotter.csv', chunksize=100000, ifSortedByDate=True,
+                 dateFormat=None):
+        """
+        :param pko: object created from (Class: PickingObj), after pko.getPosClass()
+        :param slotterFileDir: .csv file with the columns 'Location' and 'New Item' (SKU)
+        :param chunksize: number of order lines read at a time
+        :param ifSortedByDate: if the order files are sorted by date, a day is yielded as soon as
+            a later day is read, otherwise all the days are yielded at the end
+        :param dateFormat: format of the dates, e.g. '%A, %B %d, %Y' (None: inferred, slower)
+        """
+        self.pko = pko
+        self.chunksize = chunksize
+        self.ifSortedByDate = ifSortedByDate
+        self.dateFormat = dateFormat
+
+        # Slotting: SKU -> Location, only real positions (with names longer than 4)
+        slotting = pd.read_csv(slotterFileDir, usecols=['Location', 'New Item'], dtype=str)
+        self.slotting = slotting[slotting['Location'].str.len() > 4]
+
+    def readDays(self, orderFileDirs):
+        """
+        Read the order files in chunks and yield the layers to be picked day by day
+        :param orderFileDirs: one .csv file or a list of them (in order of date)
+        :return: generator of (pd.DataFrame), one per day, which could be used by (Class: Picking)
+            |New Item      |layers|date      |Location   |Class|
+            |--------------|------|----------|-----------|-----|
+            |36241-77617-03|3     |2022-02-23|801-01-A-01|0    |
+        """
+        if isinstance(orderFileDirs, str):
+            orderFileDirs = [orderFileDirs]
+
+        # Layers aggregated by date and SKU, of the days which may still get more orders
+        pending = []
+        for fileDir in orderFileDirs:
+            chunks = pd.read_csv(fileDir, chunksize=self.chunksize, dtype={self.skuCol: str},
+                                 usecols=[self.skuCol, self.categoryCol, self.dateCol, self.layersCol])
+            for chunk in chunks:
+                pending.append(self._aggregate(chunk))
+                if not self.ifSortedByDate:
+                    continue
+                # Days before the last day read are complete
+                pending = [pd.concat(pending)]
+                lastDay = pending[0]['date'].max()
+                done = pending[0][pending[0]['date'] < lastDay]
+                pending = [pending[0][pending[0]['date'] >= lastDay]]
+                for day in self._getDays(done):
+                    yield day
+
+        if len(pending) > 0:
+            for day in self._getDays(pd.concat(pending)):
+                yield day
+
+    def _aggregate(self, chunk):
+        # Shipped layer orders, summed by date and SKU
+        chunk = chunk[(chunk[self.categoryCol] == 'Shipped') & (chunk[self.layersCol] > 0)]
+        dates = pd.to_datetime(chunk[self.dateCol], format=self.dateFormat, errors='coerce')
+        df = pd.DataFrame({'New Item': chunk[self.skuCol].values,
+                           'layers': chunk[self.layersCol].values,
+                           'date': dates.dt.strftime('%Y-%m-%d').fillna('0001-01-01').values})
+        return df.groupby(['date', 'New Item'], as_index=False, sort=False)['layers'].sum()
+
+    def _getDays(self, df):
+        # Join the layers of SKUs to their locations and classes, and split them by date
+        if len(df) == 0:
+            return
+        df = df.groupby(['date', 'New Item'], as_index=False, sort=True)['layers'].sum()
+        df = df.merge(self.slotting, on='New Item', how='inner')
+        df = df.assign(Class=df['Location'].map(self.pko.posClsDict))
+        df = df[df['Class'].notna()].astype({'Class': int})
+        df = df[['New Item', 'layers', 'date', 'Location', 'Class']].sort_values(['date', 'New Item'], kind='stable')
+        bounds = np.flatnonzero(np.r_[True, df['date'].values[1:] != df['date'].values[:-1], True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield df.iloc[start:end].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    from PickingObj import PickingObj
+    from Picking import Picking
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    for df in OrderStream(pko).readDays('order_data.csv'):
+        pk = Picking(pko, df)
+        pk.picking()
+        print(df['date'].iloc[0], pk.travelDistance)
@@ -1,85 +1,231 @@
 import warnings
 warnings.filterwarnings('ignore')
+import json
+import time
 import pandas as pd
 import numpy as np
-from itertools import combinations
-from itertools import permutations
 from Tools import Tools
+from BatchRoute import BatchRoute
 
 
 
 class Picking:
-    def __init__(self, pko, df):
+    # Fields of the route table, see self.getRouteTable()
+    routeDtype = np.dtype([('region', np.int16), ('route', np.int32), ('leg', np.int16), ('from', np.int32),
+                           ('to', np.int32), ('fork', np.int8), ('distance', np.float64), ('layers', np.int8)])
+
+    def __init__(self, pko, df, engine='array', ifProfile=False, callback=None, batching='greedy'):
         self.df = df   # data of items to be picked as (pd.DataFrame)
         self.df_cls = None
 
         self.pko = pko # object created from (Class: PickingLogic), 
                        # which store and organize some useful infos
 
+        # Engine of pair picking, both give the same routes
+        # 'array': greedy picking on arrays of position IDs (self._pairPicking)
+        # 'pandas': greedy picking on the rows of self.df_pairs (self._pickFirstPair, self._continuePicking)
+        if engine not in ('array', 'pandas'):
+            raise ValueError("engine should be 'array' or 'pandas', got " + repr(engine))
+        self.engine = engine
+
+        # Batching of the positions left after step (3) of self.picking()
+        # 'greedy': pair picking by the engine
+        # 'exact': savings based batches, each picked by its optimal route (see BatchRoute),
+        #          the routes are memoized in pko.batchRoute, and so shared by all the days
+        if batching not in ('greedy', 'exact'):
+            raise ValueError("batching should be 'greedy' or 'exact', got " + repr(batching))
+        self.batching = batching
+
+        # Profiling (only if ifProfile), see self.getStats()
+        # callback(cls, stage, seconds) is called at the end of each stage
+        self.ifProfile = ifProfile
+        self.callback = callback
+        self.stats = {}
+        self._lastTick = 0
+
         self.Routes = []
         self.routes = None
+        self.routeTable = None # self.Routes as a structured array, see self.getRouteTable()
+        self.unknownNames = np.array([], dtype=str) # names of the locations not in the layout, IDs -2, -3, ...
         self.travelDistance = 0
 
     # main function
     def picking(self):
-        df = self.df
-        pko = self.pko
-        for cls in range(int(max(pko.posCls)+1)):
-            # (1) Filter positions in the same cls(class or section)
-            self.df_cls = df[df['Class']==cls]
-
-            # (2) Take away positions that contains more than 5 layers
-            # e.g. position 'LAY414' has 8 layers to be picked, then this step will take away 5 layers from 'LAY414'
-            self.routes = self._pickLayersMoreThan5()
-
-            # (3) Delete positions that all have been picked
-            # and use a dictionary to store the leftover items
-            # {'Position': number of layers}
-            self.df_cls = self.df_cls[self.df_cls['layers']>0]
-            self.dict_cls = {}
-            for idx, row in self.df_cls.iterrows():
-                self.dict_cls[row['Location']] = row['layers']
-
-            # (4) Pair picking
-            # (4.1) Filter pairs(from pko.posPairs) that contains positions having layers to be picked
-            usefulPosPairs = []
-            for p in list(permutations(self.dict_cls.keys(), 2)):
-                for pair in self.pko.posPairs[cls]:
-                    if list(p) in pair:
-                        usefulPosPairs.append(pair)
-
-            # (4.2) Sort pairs by distance
-            if len(usefulPosPairs) > 0:
-                df_pairs = pd.DataFrame(np.array(usefulPosPairs), columns=['pairs', 'route type', 'distance'])
+        for cls in range(int(max(self.pko.posCls)+1)):
+            self.Routes.append(self.pickRegion(cls))
+
+        # Finally, calculate the total travel distance
+        self.routeTable = self.getRouteTable()
+        self.travelDistance = self.getTravelDistance()
+
+    def getTravelDistance(self):
+        # Sum of the distances of all the legs (positions without location have nan distances, not counted)
+        table = self.routeTable if self.routeTable is not None else self.getRouteTable()
+        distance = table['distance']
+        return float(np.sum(distance[distance > 1]))
+
+    def getRouteTable(self):
+        """
+        self.Routes as a table, one row per leg (or per route picking a single position)
+        :return: (np.recarray) with the fields of Picking.routeDtype
+            region | route | leg | from | to | fork | distance | layers
+            - route: index of the route over all regions, leg: index of the leg in the route
+            - from, to: IDs of positions (see pko.registry), to = -1 if the route picks a single position,
+              a location not in the layout has the ID -2 - k, where self.unknownNames[k] is its name
+            - fork: forkLoc of the leg (-1 if not a fork pair), distance: 0 if a single position
+            - layers: layers picked by the whole route (see self.getRouteLayers())
+        """
+        rows = []
+        route = 0
+        for cls, (routes, layers) in enumerate(zip(self.Routes, self.getRouteLayers())):
+            for legs, lyr in zip(routes, layers):
+                if len(legs[0]) == 1:
+                    rows.append((cls, route, 0, legs[0][0], '', -1, 0.0, lyr))
+                else:
+                    rows += [(cls, route, i, leg[0], leg[1], leg[2], leg[3], lyr) for i, leg in enumerate(legs)]
+                route += 1
+        table = np.zeros(len(rows), dtype=self.routeDtype).view(np.recarray)
+        if len(rows) > 0:
+            region, route, leg, name1, name2, fork, distance, layers = zip(*rows)
+            table['region'], table['route'], table['leg'] = region, route, leg
+            names = np.array(name1 + name2)
+            ids = self.pko.registry.getIds(names)
+            unknown = (ids < 0) & (names != '')
+            self.unknownNames, k = np.unique(names[unknown], return_inverse=True)
+            ids[unknown] = -2 - k
+            table['from'], table['to'] = ids[:len(rows)], ids[len(rows):]
+            table['fork'], table['distance'], table['layers'] = fork, distance, layers
+        return table
+
+    def saveRouteTable(self, fileDir):
+        """
+        Save self.routeTable as binary (.npy, read back by Picking.readRouteTable(), IDs only)
+        or as .csv (with the names of positions, also the ones not in the layout)
+        """
+        table = self.routeTable if self.routeTable is not None else self.getRouteTable()
+        if fileDir.endswith('.csv'):
+            df = pd.DataFrame(table)
+            # ID -1: no position, ID -2 - k: self.unknownNames[k]
+            names = np.concatenate([self.pko.registry.names, self.unknownNames[::-1], ['']])
+            df.insert(4, 'from name', names[table['from']])
+            df.insert(6, 'to name', names[table['to']])
+            df.to_csv(fileDir, index=False)
+        else:
+            np.save(fileDir, np.asarray(table), allow_pickle=False)
+
+    @staticmethod
+    def readRouteTable(fileDir):
+        # Route table saved by Picking.saveRouteTable() as .npy
+        return np.load(fileDir, allow_pickle=False).view(np.recarray)
+
+    def getRouteLayers(self):
+        """
+        Layers picked by each route of self.Routes, see Picking.getRouteLoads()
+        :return: list of lists, layers of self.Routes[cls][i]
+        """
+        Layers = []
+        for cls, routes in enumerate(self.Routes):
+            df_cls = self.df[self.df['Class']==cls]
+            loads = self.getRouteLoads(routes, zip(df_cls['Location'], df_cls['layers']))
+            Layers.append([int(sum(load.values())) for load in loads])
+        return Layers
+
+    @staticmethod
+    def getRouteLoads(routes, lines):
+        """
+        Layers picked at each position by each route of a region, by the steps of Picking.pickRegion():
+        the first routes of a region are the ones of step (2), 5 layers each,
+        then the other routes pick all the layers left (less than 5) of their positions
+        :param routes: routes of the region, e.g. self.Routes[cls]
+        :param lines: (Location, layers) of the region, in the order of the pick list
+        :return: list of {'Position': layers}, one per route
+        """
+        lines = list(lines)
+        left = {loc: layers % 5 for loc, layers in lines}
+        loads = [{loc: 5} for loc, layers in lines for t in range(layers // 5)]
+        loads += [{loc: left[loc] for loc in Picking.getRoutePositions(route)} for route in routes[len(loads):]]
+        return loads
+
+    @staticmethod
+    def getRoutePositions(route):
+        # Positions of a route, [['Position']] or [[name1, name2, forkLoc, distance], ...]
+        if len(route[0]) == 1:
+            return [route[0][0]]
+        locs = []
+        for leg in route:
+            for loc in leg[:2]:
+                if loc not in locs:
+                    locs.append(loc)
+        return locs
+
+    def pickRegion(self, cls):
+        """
+        Pick the positions of region cls in self.df, by the steps (1) - (4) below
+        :param cls: region (class or section)
+        :return: routes of the region, i.e. self.Routes[cls] after self.picking()
+        """
+        if self.ifProfile: self._tick(cls)
+        # (1) Filter positions in the same cls(class or section)
+        self.df_cls = self.df[self.df['Class']==cls]
+        if self.ifProfile: self._tick(cls, 'filter')
+
+        # (2) Take away positions that contains more than 5 layers
+        # e.g. position 'LAY414' has 8 layers to be picked, then this step will take away 5 layers from 'LAY414'
+        self.routes = self._pickLayersMoreThan5()
+        if self.ifProfile: self._tick(cls, 'more than 5 layers')
+
+        # (3) Delete positions that all have been picked
+        # and use a dictionary to store the leftover items
+        # {'Position': number of layers}
+        self.df_cls = self.df_cls[self.df_cls['layers']>0]
+        self.dict_cls = {}
+        for idx, row in self.df_cls.iterrows():
+            self.dict_cls[row['Location']] = row['layers']
+        if self.ifProfile: self._tick(cls, 'leftover layers')
+
+        # (4) Pair picking
+        # (4.1) Filter pairs(from pko.posPairs) that contains positions having layers to be picked
+        # (4.2) Sort pairs by distance
+        # (4.3) Start pair picking
+        # until there is at most one position that has not been picked
+        if self.batching == 'exact':
+            self._exactPicking(cls)
+        elif self.engine == 'array':
+            self._pairPicking(cls)
+        else:
+            # Same pairs as pko.getPairsAmong(), as typed columns (no object arrays),
+            # locations outside the layout or region cls have no pairs (picked alone in step (4.4))
+            id1, id2, routeType, distance = self.pko.getPairArraysAmong(
+                cls, self.pko.registry.getIds(list(self.dict_cls.keys())))
+            if self.ifProfile:
+                self._count(cls, 'pairs considered', len(id1))
+                self._tick(cls, 'pair lookup')
+            if len(id1) > 0:
+                names = self.pko.registry.names
+                df_pairs = pd.DataFrame({'l1': names[id1], 'l2': names[id2], 'route type': routeType,
+                                         'distance': distance})
                 df_pairs.sort_values(by=['distance'], ascending=True, inplace=True)
-                df_pairs['l1'] = np.array(df_pairs['pairs'].to_list())[:,0]
-                df_pairs['l2'] = np.array(df_pairs['pairs'].to_list())[:,1]
                 self.df_pairs = df_pairs
+            if self.ifProfile: self._tick(cls, 'sort')
 
-            # (4.3) Start pair picking
-            # until there is at most one position that has not been picked
             while sum(np.array(list(self.dict_cls.values())) > 0) > 1:
                 # (4.3.1) Picing the first pair with shortest distance
                 totalLayers, lastRouteType = self._pickFirstPair()
                 if totalLayers == 0:
                     break
                 # (4.3.2) If the total layers picked <= 5, continue picking
-                self._continuePicking(totalLayers, lastRouteType)
+                self._continuePicking(totalLayers, lastRouteType, cls)
+            if self.ifProfile: self._tick(cls, 'batching')
 
-            # (4.4) Finally, pick the left layers if exists
-            for key in self.dict_cls.keys():
-                if self.dict_cls[key] > 0:
-                    self.routes.append([[key]])
-                    self.dict_cls[key] = 0
-            self.Routes.append(self.routes)
-
-        # Finally, calculate the total travel distance
-        for i in sum(sum(sum(self.Routes, []), []), []):
-            try:
-                if i > 1: self.travelDistance += i
-            except:
-                pass
-        
+        # (4.4) Finally, pick the left layers if exists
+        for key in self.dict_cls.keys():
+            if self.dict_cls[key] > 0:
+                self.routes.append([[key]])
+                self.dict_cls[key] = 0
+        if self.ifProfile:
+            self._count(cls, 'routes', len(self.routes))
+            self._tick(cls, 'left layers')
+        return self.routes
 
     def _pickLayersMoreThan5(self):
         df_cls = self.df_cls
@@ -102,9 +248,9 @@ class Picking:
         totalLayers = 0
         lastRouteType = -1
         for idx in range(len(df_pairs)):
-            loc1, loc2 = df_pairs.loc[df_pairs.index[idx], 'pairs']
-            lastRouteType = df_pairs.loc[df_pairs.index[idx], 'route type']
-            distance = df_pairs.loc[df_pairs.index[idx], 'distance']
+            loc1, loc2 = str(df_pairs.loc[df_pairs.index[idx], 'l1']), str(df_pairs.loc[df_pairs.index[idx], 'l2'])
+            lastRouteType = int(df_pairs.loc[df_pairs.index[idx], 'route type'])
+            distance = float(df_pairs.loc[df_pairs.index[idx], 'distance'])
             lyr1 = dict_cls[loc1]
             lyr2 = dict_cls[loc2]
             totalLayers = lyr1 + lyr2
@@ -116,7 +262,7 @@ class Picking:
                 return totalLayers, lastRouteType    
         return 0,0
 
-    def _continuePicking(self, totalLayers, lastRouteType):
+    def _continuePicking(self, totalLayers, lastRouteType, cls=0):
         df_pairs = self.df_pairs
         dict_cls = self.dict_cls
         locs     = self.locs
@@ -125,10 +271,11 @@ class Picking:
         iters = 0
         while totalLayers < 5 and iters < len(df_pairs):
             iters += 1
+            if self.ifProfile: self._count(cls, 'continue iterations')
             for idx in df_pairs.index:
                 # Try a pair of positions: (loc3, loc4)
-                loc3, loc4 = df_pairs.loc[idx, 'pairs']
-                distance = df_pairs.loc[idx, 'distance']
+                loc3, loc4 = str(df_pairs.loc[idx, 'l1']), str(df_pairs.loc[idx, 'l2'])
+                distance = float(df_pairs.loc[idx, 'distance'])
                 # (1) First exclude pairs that don't need any pick
                 if dict_cls[loc3] == 0 and dict_cls[loc4] == 0: 
                     continue
@@ -152,9 +299,10 @@ class Picking:
                 for r in route:
                     if loc in r:
                         lastRouteType = r[-1]
-                routeType = df_pairs.loc[idx, 'route type']
-                if lastRouteType == 0 and routeType == 1: continue
-                if lastRouteType == 1 and routeType == 0: continue
+                routeType = int(df_pairs.loc[idx, 'route type'])
+                if (lastRouteType == 0 and routeType == 1) or (lastRouteType == 1 and routeType == 0):
+                    if self.ifProfile: self._count(cls, 'fork side rejects')
+                    continue
                 
                 if totalLayers + dict_cls[loc] <= 5:
                     totalLayers += dict_cls[loc]
@@ -163,4 +311,187 @@ class Picking:
                     lastRouteType = routeType
                     route.append([loc3, loc4, lastRouteType, distance])
                     break
-        self.routes.append(route)
\ No newline at end of file
+        self.routes.append(route)
+
+    def _pairPicking(self, cls):
+        """
+        Same greedy pair picking as self._pickFirstPair() and self._continuePicking(),
+        but on arrays of position IDs instead of the rows of self.df_pairs:
+        - a pair rejected as the first pair of a route will never be picked later
+          (its positions are picked, or their layers are more than 5), so the search of
+          first pairs goes on from where the last one stopped instead of the top
+        - a route is only continued by pairs containing one of its positions,
+          and the first one of them (by distance) meeting all the rules is picked at once
+        :param cls: region of the positions in self.dict_cls
+        """
+        dict_cls = self.dict_cls
+        locs = list(dict_cls.keys())
+        ids = self.pko.registry.getIds(locs)
+        names = self.pko.registry.names
+        layers = np.array([dict_cls[loc] for loc in locs])
+        nLeft = int(np.sum(layers > 0))
+
+        # (1) Pairs among the positions, sorted by distance with the same sort as the 'pandas' engine
+        # (so pairs of the same distance are in the same order): nan distances (positions without location)
+        # are left out of the sort and put at the end, positions are indexed by their order in self.dict_cls
+        id1, id2, routeType, distance = self.pko.getPairArraysAmong(cls, ids)
+        isNan = np.isnan(distance)
+        order = np.concatenate([np.flatnonzero(~isNan)[np.argsort(distance[~isNan])], np.flatnonzero(isNan)])
+        id1, id2, routeType, distance = id1[order], id2[order], routeType[order], distance[order]
+        localIdx = np.full(len(names), -1)
+        located = ids >= 0 # locations not in the layout have no pairs
+        localIdx[ids[located]] = np.flatnonzero(located)
+        l1, l2 = localIdx[id1], localIdx[id2]
+        nPairs = len(l1)
+        if self.ifProfile:
+            self._count(cls, 'pairs considered', nPairs)
+            self._tick(cls, 'sort')
+
+        # (2) Pairs containing each position, as indices of the sorted pairs
+        ends = np.concatenate([l1, l2])
+        byEnd = np.argsort(ends, kind='stable')
+        adjPairs = np.split(np.concatenate([np.arange(nPairs), np.arange(nPairs)])[byEnd],
+                            np.cumsum(np.bincount(ends, minlength=len(locs)))[:-1])
+
+        ptr = 0
+        while nLeft > 1:
+            # (3) Picking the first pair with shortest distance
+            while ptr < nPairs:
+                lyr1, lyr2 = layers[l1[ptr]], layers[l2[ptr]]
+                if (lyr1 > 0) and (lyr2 > 0) and (lyr1 + lyr2 <= 5):
+                    break
+                ptr += 1
+            if ptr == nPairs:
+                break
+            totalLayers = layers[l1[ptr]] + layers[l2[ptr]]
+            lastRouteType = routeType[ptr]
+            layers[l1[ptr]] = 0
+            layers[l2[ptr]] = 0
+            nLeft -= 2
+            members = [l1[ptr], l2[ptr]]
+            inRoute = np.zeros(len(locs), dtype=bool)
+            inRoute[members] = True
+            route = [self._getLeg(names, id1, id2, routeType, distance, ptr)]
+
+            # (4) If the total layers picked <= 5, continue picking
+            while totalLayers < 5:
+                cand = np.concatenate([adjPairs[m] for m in members])
+                in1 = inRoute[l1[cand]]
+                other = np.where(in1, l2[cand], l1[cand])
+                ok = (in1 != inRoute[l2[cand]]) & (layers[other] > 0) & (totalLayers + layers[other] <= 5)
+                # Pairs not on the same side of the last pair (if applicable)
+                if self.ifProfile:
+                    okSide = ok.copy()
+                if lastRouteType == 0:
+                    ok &= routeType[cand] != 1
+                if lastRouteType == 1:
+                    ok &= routeType[cand] != 0
+                if self.ifProfile:
+                    self._count(cls, 'continue iterations')
+                    self._count(cls, 'fork side rejects', int(np.sum(okSide & ~ok)))
+                if not ok.any():
+                    break
+                k = np.min(cand[ok])
+                loc = l2[k] if inRoute[l1[k]] else l1[k]
+                totalLayers += layers[loc]
+                layers[loc] = 0
+                nLeft -= 1
+                members.append(loc)
+                inRoute[loc] = True
+                lastRouteType = routeType[k]
+                route.append(self._getLeg(names, id1, id2, routeType, distance, k))
+            self.routes.append(route)
+
+        for i in np.flatnonzero(layers == 0):
+            dict_cls[locs[i]] = 0
+        if self.ifProfile: self._tick(cls, 'batching')
+
+    def getStats(self):
+        """
+        Profile of self.picking() (with ifProfile=True)
+        :return: (dict) {region: {'times': {stage: seconds}, 'counters': {name: count}}, 'total': {...}}
+            stages: 'filter', 'more than 5 layers', 'leftover layers', 'pair lookup'('pandas' only),
+                    'sort', 'batching', 'exact batching'(batching='exact' only), 'left layers'
+            counters: 'pairs considered', 'continue iterations', 'fork side rejects', 'routes',
+                      'batches'(batching='exact' only)
+            counters are the work done by the engine, e.g. the 'pandas' engine rescans all the pairs
+            for each continue iteration, so its counts are larger than those of the 'array' engine
+        """
+        total = {'times': {}, 'counters': {}}
+        for stats in self.stats.values():
+            for key in total:
+                for name, value in stats[key].items():
+                    total[key][name] = total[key].get(name, 0) + value
+        return dict(self.stats, total=total)
+
+    def dumpStats(self, fileDir=None):
+        """
+        :param fileDir: .json file to write the profile to (None: not saved)
+        :return: (str) self.getStats() as json
+        """
+        text = json.dumps({str(key): value for key, value in self.getStats().items()}, indent=2)
+        if fileDir is not None:
+            with open(fileDir, 'w') as f:
+                f.write(text)
+        return text
+
+    def _tick(self, cls, stage=None):
+        # Time since the last tick is added to the stage (no stage: only start timing)
+        now = time.perf_counter()
+        if stage is not None:
+            times = self.stats.setdefault(cls, {'times': {}, 'counters': {}})['times']
+            times[stage] = times.get(stage, 0) + now - self._lastTick
+            if self.callback is not None:
+                self.callback(cls, stage, now - self._lastTick)
+        self._lastTick = time.perf_counter()
+
+    def _count(self, cls, name, n=1):
+        counters = self.stats.setdefault(cls, {'times': {}, 'counters': {}})['counters']
+        counters[name] = counters.get(name, 0) + int(n)
+
+    def _exactPicking(self, cls):
+        """
+        Pick the positions in self.dict_cls by batches of at most 5 layers (BatchRoute.buildBatches()),
+        each batch in its optimal route (BatchRoute.getRoute())
+        The greedy pair picking of the same positions is kept instead if its legs are shorter in total,
+        so the routes of a region are never longer than the ones of batching='greedy'
+        :param cls: region of the positions in self.dict_cls
+        """
+        if self.pko.batchRoute is None:
+            self.pko.batchRoute = BatchRoute(self.pko)
+        batchRoute = self.pko.batchRoute
+        locs = [loc for loc in self.dict_cls.keys() if self.dict_cls[loc] > 0]
+        ids = self.pko.registry.getIds(locs)
+        layers = [self.dict_cls[loc] for loc in locs]
+
+        # Greedy plan (the 'array' engine gives the same routes as the 'pandas' one)
+        routes, dict_cls = self.routes, dict(self.dict_cls)
+        self.routes = []
+        self._pairPicking(cls)
+        greedyRoutes, greedyDict = self.routes, self.dict_cls
+        self.routes, self.dict_cls = [], dict_cls
+
+        batches = [batch for batch in batchRoute.buildBatches(cls, ids, layers) if len(batch) > 1]
+        for batch in batches: # batches of one position are picked in step (4.4)
+            distance, route = batchRoute.getRoute(cls, ids[batch])
+            if len(route) == 0:
+                continue
+            self.routes.append([list(leg) for leg in route])
+            for i in batch:
+                self.dict_cls[locs[i]] = 0
+        if self._getRoutesDistance(greedyRoutes) < self._getRoutesDistance(self.routes):
+            self.routes, self.dict_cls = greedyRoutes, greedyDict
+            if self.ifProfile: self._count(cls, 'greedy kept')
+        self.routes = routes + self.routes
+        if self.ifProfile:
+            self._count(cls, 'batches', len(batches))
+            self._tick(cls, 'exact batching')
+
+    @staticmethod
+    def _getRoutesDistance(routes):
+        # Total distance of the legs of routes, counted the same way as self.getTravelDistance()
+        return sum(leg[3] for route in routes for leg in route if len(leg) > 3 and leg[3] > 1)
+
+    def _getLeg(self, names, id1, id2, routeType, distance, k):
+        # A leg of route in the same format as posPairs: [name1, name2, route type, distance]
+        return [str(names[id1[k]]), str(names[id2[k]]), int(routeType[k]), float(distance[k])]
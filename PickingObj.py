@@ -1,9 +1,63 @@
 from Route import Route
 import numpy as np
+import hashlib
+import os
+import re
 from itertools import combinations
 from Tools import Tools
+from WarehouseObj import PosRegistry
+from AisleGraph import AisleGraph
 import pandas as pd
-import openpyxl
+
+class PosPairs:
+    """
+    Pairs of positions of a region as typed arrays, one entry per pair (forkLoc = -1)
+    or two entries per fork pair (forkLoc = 0 and 1), in the order of combinations(names, 2)
+    Indexing and iterating give the list format [[name1, name2], forkLoc, distance]
+    """
+    def __init__(self, names, idx1, idx2, forkLoc, distance):
+        self.names = np.asarray(names)                     # names of positions in the region
+        self.idx1 = np.asarray(idx1, dtype=np.int32)       # indices of name1 in self.names
+        self.idx2 = np.asarray(idx2, dtype=np.int32)       # indices of name2, idx1 < idx2
+        self.forkLoc = np.asarray(forkLoc, dtype=np.int8)  # -1 if not a fork pair
+        self.distance = np.asarray(distance, dtype=np.float64)
+
+    @classmethod
+    def fromDistances(cls, names, idx1, idx2, dist, isFork):
+        """
+        :param idx1, idx2: indices of pairs of positions in the region
+        :param dist: array (2, m) of distances for forkLoc = 0/1, isFork: array (m,)
+        """
+        repeats = np.where(isFork, 2, 1)
+        starts = np.cumsum(repeats) - repeats
+        forkLoc = np.full(np.sum(repeats), -1)
+        forkLoc[starts[isFork]] = 0
+        forkLoc[starts[isFork] + 1] = 1
+        k = np.repeat(np.arange(len(repeats)), repeats)
+        return cls(names, np.repeat(idx1, repeats), np.repeat(idx2, repeats), forkLoc,
+                   dist[np.maximum(forkLoc, 0), k])
+
+    def __len__(self):
+        return len(self.distance)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        return [[str(self.names[self.idx1[k]]), str(self.names[self.idx2[k]])], int(self.forkLoc[k]),
+                float(self.distance[k])]
+
+    def __iter__(self):
+        names = self.names.tolist()
+        for i, j, f, d in zip(self.idx1.tolist(), self.idx2.tolist(), self.forkLoc.tolist(), self.distance.tolist()):
+            yield [[names[i], names[j]], f, d]
+
+    def __repr__(self):
+        return 'PosPairs(' + str(len(self)) + ' pairs of ' + str(len(self.names)) + ' positions)'
+
+    @property
+    def nbytes(self):
+        return self.idx1.nbytes + self.idx2.nbytes + self.forkLoc.nbytes + self.distance.nbytes
+
 
 class PickingObj:
     def __init__(self,
@@ -12,32 +66,49 @@ class PickingObj:
         bondAisles_x=[145.5, 265.5],
         ifCorrectPosKeys=True
     ):
-        self.Route = Route(aisles_x, layoutFileDir)
-        self.positions = self.Route.palletPos.locDict
         self.aisles_x = aisles_x
         self.bondAisles_x = bondAisles_x
-
-        self.posKeys = np.array(list(self.positions.keys()))
-        if ifCorrectPosKeys:
-            self._correctPosKeys()
-        self.posValues = np.array(list(self.positions.values()))
+        self.ifCorrectPosKeys = ifCorrectPosKeys
+        self._readLayout(layoutFileDir)
 
         # Update through self.getPosClass()
         self.posCls = np.zeros(len(self.posKeys))
         self.posClsDict = {}
         # Update through self.getPairDistance()
-        self.posPairs = []
+        self.posPairs = []     # posPairs[cls]: (Class: PosPairs) of region cls
+        self.regionKeys = []   # regionKeys[cls]: names of positions in region cls
+        self.pairDistMat = []  # pairDistMat[cls]: array (2, n, n) of distances for forkLoc = 0/1
+        self.forkPairMask = [] # forkPairMask[cls]: array (n, n), True if the distance depends on forkLoc
+        self.regionIds = []    # regionIds[cls]: IDs of positions in region cls, aligned with regionKeys[cls]
+        self.regionIndex = np.zeros(len(self.posKeys), dtype=int) # regionIndex[ID]: index of ID in its region
+        # Only with pruning (kNearest or maxDistance of self.getPairDistance()), instead of the matrices:
+        self.prunedPairs = []  # prunedPairs[cls]: (idx1, idx2, dist(2, m), isFork) of the pairs kept, idx1 < idx2
+        self.kNearest = None
+        self.maxDistance = None
+        self.backend = 'route'
+        self.aisleGraph = None # (Class: AisleGraph), only with backend='graph' of self.getPairDistance()
+        self.ybot, self.ytop = self.Route.ybot, self.Route.ytop # bottom and top lines, the same as Route
         # Update through self.getSKUPosDict()
         self.SKUPosDict = {}
+        # Optimal routes of batches (Class: BatchRoute), created by (Class: Picking) with batching='exact'
+        self.batchRoute = None
+
+    def _readLayout(self, layoutFileDir):
+        self.Route = Route(self.aisles_x, layoutFileDir)
+        self.positions = self.Route.palletPos.locDict
+        self.layoutFileDir = layoutFileDir
+
+        self.posKeys = np.array(list(self.positions.keys()))
+        if self.ifCorrectPosKeys:
+            self._correctPosKeys()
+        self.posValues = np.array(list(self.positions.values()))
+        # ID of each position is its index in self.posKeys
+        self.registry = PosRegistry(self.posKeys, self.posValues)
 
     def _correctPosKeys(self):
-        self.posKeys = self.posKeys.astype('U25') # Enlarge the dtype of array to make it long enough to store long names
-        for i in range(len(self.posKeys)):
-            self.posKeys[i] = Tools.correctPosName(self.posKeys[i])
-        Pos_temp = self.positions.copy()
-        self.positions = {}
-        for key in Pos_temp:
-            self.positions[Tools.correctPosName(key)] = Pos_temp[key]
+        self.posKeys = Tools.correctPosNames(self.posKeys)
+        self.positions = dict(zip(self.posKeys.tolist(), self.positions.values()))
+        self.posKeys = np.array(list(self.positions.keys())) # two names may be corrected into the same one
 
     def getSKUPosDict(self, fileDir):
         '''
@@ -50,50 +121,455 @@ class PickingObj:
         SKUPosDict['New Item'] = 'Location'
         '''
         df = pd.read_csv(fileDir)
-        for index, row in df.iterrows():
-            self.SKUPosDict[str(row[1])] = Tools.correctPosName(row[0])
+        self.SKUPosDict.update(zip(df.iloc[:, 1].astype(str), Tools.correctPosNames(df.iloc[:, 0]).tolist()))
 
     def getPosClass(self):
 
         for cls in range(len(self.bondAisles_x)):
             self.posCls[self.posValues[:,0] > self.bondAisles_x[cls]] = cls + 1
-        for i in range(len(self.posCls)):
-            self.posClsDict[self.posKeys[i]] = int(self.posCls[i])
+        self.posClsDict.update(zip(self.posKeys.tolist(), self.posCls.astype(int).tolist()))
 
-    def getPairDistance(self, if_saveToExcel=False, outputFileDir="Pair_Distance.xlsx"):
+    def getPairDistance(self, if_saveToExcel=False, outputFileDir="Pair_Distance.xlsx", ifVectorize=True,
+                        cacheDir=None, kNearest=None, maxDistance=None, backend='route'):
         """
         Calculate the route distance between each pair of pallet positions
+        :param ifVectorize: compute the distances of each region with array operations (True)
+            or route by route through self.Route.getRoute() (False), both give the same result
+        :param cacheDir: directory to load/save the distance matrices as a .npz file (None: no cache)
+            the file is keyed by the layout file, aisles and geometry of Route,
+            so a stale cache is never loaded but rebuilt, and only the last file of each layout file is kept
+        :param kNearest: only keep the pairs of each position with its k nearest positions (None: all)
+        :param maxDistance: only keep the pairs within this distance (None: all)
+            with kNearest or maxDistance, the kept pairs are stored in self.prunedPairs instead of
+            the (n, n) matrices, and the pairs pruned are calculated again when asked for
+            (see self.getRegionDistances()), so the routes of (Class: Picking) stay the same
+        :param backend: how the distances are calculated
+            'route': the 3-row geometry of (Class: Route)
+            'graph': shortest paths of (Class: AisleGraph), for layouts of any number of rows
+            (the same distances as 'route' for "layout.csv")
+        The bottom and top lines are the ones of self.Route (see PalletPos.getLines()), without the positions
+        that have no location: before, such positions (e.g. in "layout_new.csv") made the lines nan, every row
+        was then taken as the middle one and no pair was a fork pair, so the distances of those layouts changed
         :return: create and save into a .xlsx file
         """
-        ybot = np.min(self.posValues[:,-1])
-        ytop = np.max(self.posValues[:,-1])
+        ybot, ytop = self.Route.ybot, self.Route.ytop
         ymid = (ybot+ytop)/2
+        self.ybot, self.ytop = ybot, ytop
+        self.kNearest = kNearest
+        self.maxDistance = maxDistance
+        if backend not in ('route', 'graph'):
+            raise ValueError("backend should be 'route' or 'graph'")
+        self.backend = backend
+        self.aisleGraph = AisleGraph(self.registry.coords, self.aisles_x, Route.h) if backend == 'graph' else None
 
-        for cls in range(len(self.aisles_x) + 1):
-            keys = self.posKeys[self.posCls == cls]
-            combs = combinations(keys, 2)
-            pairs = []
-            for comb in combs:
-                p1 = self.positions[comb[0]]
-                p2 = self.positions[comb[1]]
-                if (p1[1] == ymid or p2[1] == ymid) and (p1[1] != p2[1]):
-                    if p2[1] == ymid:
-                        p1, p2 = p2, p1
-                    for forkLoc in [0,1]:
-                        rt, id = self.Route.getRoute(p1,p2,ybot,ytop,forkLoc)
-                        pairs.append([list(comb), forkLoc, self.Route.calculateRoute(np.array(rt))])
-                else:
-                    rt, id = self.Route.getRoute(p1,p2,ybot,ytop)
-                    pairs.append([list(comb), -1, self.Route.calculateRoute(np.array(rt))])
-            self.posPairs.append(pairs)
+        self.posPairs = []
+        self.regionKeys = []
+        self.pairDistMat = []
+        self.forkPairMask = []
+        self.prunedPairs = []
+        self.batchRoute = None # routes memoized with the old distances
+        self.regionIds = [np.flatnonzero(self.posCls == cls) for cls in range(len(self.aisles_x) + 1)]
+        for ids in self.regionIds:
+            self.regionIndex[ids] = np.arange(len(ids))
+        if cacheDir is not None and self._loadPairDistance(cacheDir):
+            pass
+        else:
+            for cls in range(len(self.aisles_x) + 1):
+                if kNearest is not None or maxDistance is not None:
+                    self._getRegionPrunedDistance(self.regionIds[cls], ybot, ytop)
+                    self.posPairs.append(self._getRegionPairs(cls))
+                    continue
+                if ifVectorize or self.aisleGraph is not None:
+                    self._getRegionDistance(self.regionIds[cls], ybot, ytop)
+                    self.posPairs.append(self._getRegionPairs(cls))
+                    continue
+                keys = self.posKeys[self.regionIds[cls]]
+                n = len(keys)
+                dist = np.zeros((2, n, n))
+                forkMask = np.zeros((n, n), dtype=bool)
+                for i, j in combinations(range(n), 2):
+                    comb = (keys[i], keys[j])
+                    p1 = self.positions[comb[0]]
+                    p2 = self.positions[comb[1]]
+                    if (p1[1] == ymid or p2[1] == ymid) and (p1[1] != p2[1]):
+                        if p2[1] == ymid:
+                            p1, p2 = p2, p1
+                        for forkLoc in [0,1]:
+                            rt, id = self.Route.getRoute(p1,p2,ybot,ytop,forkLoc)
+                            dist[forkLoc, i, j] = dist[forkLoc, j, i] = self.Route.calculateRoute(np.array(rt))
+                        forkMask[i, j] = forkMask[j, i] = True
+                    else:
+                        rt, id = self.Route.getRoute(p1,p2,ybot,ytop)
+                        dist[:, i, j] = dist[:, j, i] = self.Route.calculateRoute(np.array(rt))
+                self.regionKeys.append(keys)
+                self.pairDistMat.append(dist)
+                self.forkPairMask.append(forkMask)
+                self.posPairs.append(self._getRegionPairs(cls))
+            if cacheDir is not None:
+                self._savePairDistance(cacheDir)
 
         if if_saveToExcel:
+            import openpyxl # engine of pd.ExcelWriter, only needed here
             writer = pd.ExcelWriter(outputFileDir)
             for i in range(len(self.posPairs)):
-                df = pd.DataFrame(self.posPairs[i])
+                df = pd.DataFrame(list(self.posPairs[i]))
                 df.to_excel(writer, "Region_"+str(i))
             writer.save()
 
+    def updateLayout(self, layoutFileDir=None, aisles_x=None, bondAisles_x=None):
+        """
+        Change the layout and/or the aisles, and update the pair distances without rebuilding them all:
+        - the distances between positions not moved (same name, same location) are kept
+        - the rows/columns of the positions moved or added are calculated, those of removed ones dropped
+        - a region is calculated again as a whole only if its aisles changed (see self._getRegionAisles())
+        The pair distances are rebuilt (self.getPairDistance()) if the bottom or top line moves,
+        if the rows of the aisle graph change (they set its corridors, with backend='graph'),
+        or with pruning, as the nearest positions of the others may change
+        :param layoutFileDir: new layout file (None: the same file, read again)
+        :param aisles_x: new x-coordinates of vertical aisles (None: no change)
+        :param bondAisles_x: new boundaries of regions (None: no change)
+        :return: (dict) positions: number of positions calculated again, regions: regions calculated
+            again as a whole, full: True if everything was rebuilt
+        """
+        oldAisles = list(self.aisles_x)
+        oldYs = [self.ybot, self.ytop]
+        oldRows = self.aisleGraph.rows if self.aisleGraph is not None else None
+        oldRegionKeys, oldPairDistMat, oldForkPairMask = self.regionKeys, self.pairDistMat, self.forkPairMask
+        oldCoords = pd.DataFrame(self.registry.coords, index=self.registry.index)
+        ifPruned = len(self.prunedPairs) > 0
+
+        if aisles_x is not None:
+            self.aisles_x = aisles_x
+        if bondAisles_x is not None:
+            self.bondAisles_x = bondAisles_x
+        self._readLayout(self.layoutFileDir if layoutFileDir is None else layoutFileDir)
+        self.posCls = np.zeros(len(self.posKeys))
+        self.posClsDict = {}
+        self.getPosClass()
+        self.regionIndex = np.zeros(len(self.posKeys), dtype=int)
+
+        ybot, ytop = self.Route.ybot, self.Route.ytop
+        aisleGraph = AisleGraph(self.registry.coords, self.aisles_x, Route.h) if self.backend == 'graph' else None
+        ifRowsChanged = aisleGraph is not None and (oldRows is None or not np.array_equal(oldRows, aisleGraph.rows))
+        if ifPruned or len(oldPairDistMat) == 0 or not np.array_equal(oldYs, [ybot, ytop], equal_nan=True) \
+                or ifRowsChanged:
+            self.getPairDistance(kNearest=self.kNearest, maxDistance=self.maxDistance, backend=self.backend)
+            return {'positions': len(self.posKeys), 'regions': list(range(len(self.aisles_x) + 1)), 'full': True}
+
+        self.ybot, self.ytop = ybot, ytop
+        self.posPairs = []
+        self.regionKeys = []
+        self.pairDistMat = []
+        self.forkPairMask = []
+        self.batchRoute = None # routes memoized with the old distances
+        self.aisleGraph = aisleGraph
+        self.regionIds = [np.flatnonzero(self.posCls == cls) for cls in range(len(self.aisles_x) + 1)]
+        for ids in self.regionIds:
+            self.regionIndex[ids] = np.arange(len(ids))
+
+        nPositions = 0
+        regions = []
+        for cls, ids in enumerate(self.regionIds):
+            pos = self.registry.coords[ids]
+            if cls >= len(oldRegionKeys) or \
+                    self._getRegionAisles(pos[:, 0], oldAisles) != self._getRegionAisles(pos[:, 0], self.aisles_x):
+                self._getRegionDistance(ids, ybot, ytop)
+                self.posPairs.append(self._getRegionPairs(cls))
+                regions.append(cls)
+                continue
+
+            # Positions kept: in the old region, at the same location
+            keys = self.posKeys[ids]
+            oldIndex = pd.Index(oldRegionKeys[cls]).get_indexer(keys)
+            oldPos = oldCoords.reindex(keys).values
+            kept = (oldIndex >= 0) & ((oldPos == pos) | (np.isnan(oldPos) & np.isnan(pos))).all(axis=1)
+            k, o = np.flatnonzero(kept), oldIndex[kept]
+            n = len(ids)
+            dist = np.zeros((2, n, n))
+            forkMask = np.zeros((n, n), dtype=bool)
+            dist[:, k[:, None], k[None, :]] = oldPairDistMat[cls][:, o[:, None], o[None, :]]
+            forkMask[k[:, None], k[None, :]] = oldForkPairMask[cls][o[:, None], o[None, :]]
+
+            # Rows/columns of the positions moved or added
+            changed = np.flatnonzero(~kept)
+            idx1, idx2 = np.repeat(changed, n), np.tile(np.arange(n), len(changed))
+            keep = (idx1 != idx2) & ~(~kept[idx2] & (idx2 < idx1)) # pairs of two changed ones only once
+            lo, hi = np.minimum(idx1[keep], idx2[keep]), np.maximum(idx1[keep], idx2[keep])
+            d, isFork = self._getDistances(pos[lo], pos[hi], ybot, ytop)
+            dist[:, lo, hi] = dist[:, hi, lo] = d
+            forkMask[lo, hi] = forkMask[hi, lo] = isFork
+            nPositions += len(changed)
+
+            self.regionKeys.append(keys)
+            self.pairDistMat.append(dist)
+            self.forkPairMask.append(forkMask)
+            self.posPairs.append(self._getRegionPairs(cls))
+        return {'positions': nPositions + sum(len(self.regionIds[cls]) for cls in regions), 'regions': regions,
+                'full': False}
+
+    @staticmethod
+    def _getRegionAisles(xs, aisles_x):
+        """
+        Aisles which the routes in a region may go through: a route takes the aisle closest to the mean
+        of its two x values, which is always between the aisles next to the region (inclusive)
+        :param xs: x values of the positions in the region
+        :return: tuple of the x of those aisles
+        """
+        xs = xs[~np.isnan(xs)]
+        aisles = np.sort(np.asarray(aisles_x, dtype=float))
+        if len(xs) == 0 or len(aisles) == 0:
+            return ()
+        lo = max(np.searchsorted(aisles, np.min(xs), side='right') - 1, 0)
+        hi = min(np.searchsorted(aisles, np.max(xs), side='left'), len(aisles) - 1)
+        return tuple(aisles[lo:hi + 1].tolist())
+
+    def getPairsAmong(self, cls, locs):
+        """
+        Get the entries of self.posPairs[cls] whose two positions are both in locs
+        :param cls: region of the positions
+        :param locs: names of positions
+        :return: list of [[name1, name2], forkLoc, distance], ordered by permutations(locs, 2)
+        """
+        names = self.registry.names.tolist()
+        id1, id2, forkLoc, distance = self.getPairArraysAmong(cls, self.registry.getIds(list(locs)))
+        return [[[names[i], names[j]], f, d] for i, j, f, d in
+                zip(id1.tolist(), id2.tolist(), forkLoc.tolist(), distance.tolist())]
+
+    def getPairArraysAmong(self, cls, ids):
+        """
+        Array version of self.getPairsAmong(), sliced from the distance matrices of region cls
+        :param cls: region of the positions
+        :param ids: IDs of positions (see self.registry), the ones not in the layout (-1)
+            or not in region cls have no pairs, so they are picked alone
+        :return: arrays (ID1, ID2, forkLoc, distance), in the same order as self.getPairsAmong()
+        """
+        ids = np.asarray(ids, dtype=int)
+        ids = ids[ids >= 0]
+        ids = ids[self.posCls[ids] == cls]
+        r = self.regionIndex[ids]
+        k = len(ids)
+        # permutations(ids, 2) in which (ID1, ID2) is in the order of the region, just like posPairs[cls]
+        idx1, idx2 = np.divmod(np.arange(k * k), k)
+        keep = r[idx1] < r[idx2]
+        idx1, idx2 = idx1[keep], idx2[keep]
+
+        # Fork pairs have two entries: forkLoc = 0 and 1
+        dist, isFork = self.getRegionDistances(cls, r[idx1], r[idx2])
+        pairs = PosPairs.fromDistances(ids, idx1, idx2, dist, isFork)
+        return ids[pairs.idx1], ids[pairs.idx2], pairs.forkLoc, pairs.distance
+
+    def getRegionDistances(self, cls, r1, r2):
+        """
+        Distances of pairs of positions in region cls, from the matrices or self.prunedPairs,
+        the pairs pruned are calculated again (exactly the same as without pruning)
+        :param r1, r2: arrays of indices of positions in the region (see self.regionIndex)
+        :return: dist: array (2, m) of distances for forkLoc = 0/1, isFork: array (m,)
+        """
+        r1, r2 = np.asarray(r1, dtype=int), np.asarray(r2, dtype=int)
+        if len(self.prunedPairs) == 0:
+            return self.pairDistMat[cls][:, r1, r2], self.forkPairMask[cls][r1, r2]
+        idx1, idx2, pairDist, pairFork = self.prunedPairs[cls]
+        n = len(self.regionIds[cls])
+        lo, hi = np.minimum(r1, r2), np.maximum(r1, r2)
+        keys = idx1.astype(np.int64) * n + idx2
+        wanted = lo.astype(np.int64) * n + hi
+        k = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+        found = (keys[k] == wanted) if len(keys) > 0 else np.zeros(len(wanted), dtype=bool)
+        dist = np.zeros((2, len(r1)))
+        isFork = np.zeros(len(r1), dtype=bool)
+        dist[:, found] = pairDist[:, k[found]]
+        isFork[found] = pairFork[k[found]]
+        if not found.all():
+            pos = self.registry.coords[self.regionIds[cls]]
+            miss = ~found
+            dist[:, miss], isFork[miss] = self._getDistances(pos[lo[miss]], pos[hi[miss]], self.ybot, self.ytop)
+        return dist, isFork
+
+    def _getRegionDistance(self, ids, ybot, ytop):
+        """
+        Calculate the distance matrix of all the pallet positions in one region at once, and
+        append the region to self.regionKeys, self.pairDistMat and self.forkPairMask
+        - pairDistMat[cls][forkLoc, i, j]: distance between regionKeys[cls][i] and regionKeys[cls][j]
+        - forkPairMask[cls][i, j]: True if exactly one of them is in the middle line,
+          then the distance depends on forkLoc (the side where the middle one is picked)
+        """
+        n = len(ids)
+        pos = self.registry.coords[ids]
+        idx1, idx2 = np.triu_indices(n, k=1)
+        d, isFork = self._getDistances(pos[idx1], pos[idx2], ybot, ytop)
+        dist = np.zeros((2, n, n))
+        forkMask = np.zeros((n, n), dtype=bool)
+        dist[:, idx1, idx2] = d
+        dist[:, idx2, idx1] = d
+        forkMask[idx1, idx2] = isFork
+        forkMask[idx2, idx1] = isFork
+
+        self.regionKeys.append(self.posKeys[ids])
+        self.pairDistMat.append(dist)
+        self.forkPairMask.append(forkMask)
+
+    def _getDistances(self, pos1, pos2, ybot, ytop):
+        """
+        Distances of pairs (pos1[i], pos2[i]), where pos1[i] is the first one in the order of the region
+        :return: dist: array (2, m) of distances for forkLoc = 0/1, isFork: array (m,)
+        """
+        if self.aisleGraph is not None:
+            return self.aisleGraph.getDistances(pos1, pos2)
+        ymid = (ybot+ytop)/2
+        y1, y2 = pos1[:, 1], pos2[:, 1]
+        # Just like the loop version, routes of fork pairs start from the position in the middle line
+        isFork = ((y1 == ymid) | (y2 == ymid)) & (y1 != y2)
+        swap = (isFork & (y2 == ymid))[:, None]
+        src = np.where(swap, pos2, pos1)
+        dst = np.where(swap, pos1, pos2)
+        dist = np.zeros((2, len(y1)))
+        dist[0] = self.Route.getRouteDistances(src, dst, ybot, ytop, 0)
+        # Pairs not starting from the middle line are always calculated with the default forkLoc = 0
+        dist[1] = np.where(isFork, self.Route.getRouteDistances(src, dst, ybot, ytop, 1), dist[0])
+        return dist, isFork
+
+    def _getRegionPrunedDistance(self, ids, ybot, ytop):
+        """
+        Keep the pairs of each position with its self.kNearest nearest positions (and/or within
+        self.maxDistance), and append the region to self.regionKeys and self.prunedPairs
+        The positions are indexed by x, as every route is at least |x2-x1| + Route.a long (a/2 out of
+        and a/2 into the aisles), the positions outside [x-R, x+R] are never nearer than R + Route.a
+        (with the aisle graph, 2 * AisleGraph.minStub instead of Route.a)
+        """
+        n = len(ids)
+        pos = self.registry.coords[ids]
+        order = np.argsort(pos[:, 0], kind='stable')
+        xs = pos[order, 0]
+        a = self.Route.a if self.aisleGraph is None else 2 * self.aisleGraph.minStub
+        kept = []
+        for i in range(n):
+            x = pos[i, 0]
+            if np.isnan(x):
+                continue
+            R = self.maxDistance - a if self.kNearest is None else self.Route.w * self.kNearest
+            while True:
+                lo = np.searchsorted(xs, x - R, side='left')
+                hi = np.searchsorted(xs, x + R, side='right')
+                cand = order[lo:hi]
+                cand = cand[cand != i]
+                d, isFork = self._getDistances(pos[np.minimum(i, cand)], pos[np.maximum(i, cand)], ybot, ytop)
+                d = np.min(d, axis=0)
+                ok = ~np.isnan(d) if self.maxDistance is None else d <= self.maxDistance
+                cand, d = cand[ok], d[ok]
+                if self.kNearest is None:
+                    break
+                near = np.argsort(d, kind='stable')[:self.kNearest]
+                # Exact if the k-th nearest is nearer than any position outside the window
+                if (lo == 0 and hi == n) or (len(near) == self.kNearest and d[near[-1]] <= R + a) \
+                        or (self.maxDistance is not None and R + a >= self.maxDistance):
+                    cand = cand[near]
+                    break
+                R *= 2
+            kept.append(np.minimum(i, cand) * n + np.maximum(i, cand))
+
+        keys = np.unique(np.concatenate(kept + [np.zeros(0, dtype=int)]).astype(np.int64))
+        idx1, idx2 = np.divmod(keys, n)
+        dist, isFork = self._getDistances(pos[idx1], pos[idx2], ybot, ytop)
+        self.regionKeys.append(self.posKeys[ids])
+        self.prunedPairs.append((idx1, idx2, dist, isFork))
+
+    def _getRegionPairs(self, cls):
+        """
+        Convert the distance matrix (or the pairs kept) of region cls to (Class: PosPairs):
+        [[name1, name2], forkLoc(-1 if not a fork pair), distance], in the order of combinations(keys, 2)
+        """
+        names = self.regionKeys[cls]
+        if len(self.prunedPairs) > 0:
+            idx1, idx2, dist, isFork = self.prunedPairs[cls]
+        else:
+            idx1, idx2 = np.triu_indices(len(names), k=1)
+            dist, isFork = self.getRegionDistances(cls, idx1, idx2)
+        return PosPairs.fromDistances(names, idx1, idx2, dist, isFork)
+
+    def _getCacheKey(self):
+        """
+        Hash of everything the distance matrices depend on:
+        the layout file, the aisles, the geometry of Route and the classes of positions
+        """
+        sha = hashlib.sha1()
+        with open(self.layoutFileDir, 'rb') as f:
+            sha.update(f.read())
+        config = [[float(x) for x in self.aisles_x], [float(x) for x in self.bondAisles_x],
+                  bool(self.ifCorrectPosKeys), Route.w, Route.h, Route.a, self.kNearest, self.maxDistance,
+                  self.backend]
+        sha.update(repr(config).encode())
+        sha.update(np.ascontiguousarray(self.posCls).tobytes())
+        return sha.hexdigest()
+
+    def _getCacheFileDir(self, cacheDir, key):
+        return os.path.join(cacheDir, self._getCachePrefix() + key[:16] + '.npz')
+
+    def _getCachePrefix(self):
+        # Files of the same layout file start with the same prefix, only the last one written is kept
+        return 'Pair_Distance_' + os.path.splitext(os.path.basename(self.layoutFileDir))[0] + '_'
+
+    def _savePairDistance(self, cacheDir):
+        key = self._getCacheKey()
+        arrays = {'cacheKey': np.array(key)}
+        for cls in range(len(self.regionKeys)):
+            arrays['keys_' + str(cls)] = self.regionKeys[cls]
+            if len(self.prunedPairs) > 0:
+                for name, array in zip(['idx1_', 'idx2_', 'dist_', 'fork_'], self.prunedPairs[cls]):
+                    arrays[name + str(cls)] = array
+            else:
+                arrays['dist_' + str(cls)] = self.pairDistMat[cls]
+                arrays['fork_' + str(cls)] = self.forkPairMask[cls]
+
+        # Write to a temporary file first, so other processes never read a half-written cache
+        os.makedirs(cacheDir, exist_ok=True)
+        fileDir = self._getCacheFileDir(cacheDir, key)
+        tmpFileDir = fileDir + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpFileDir, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmpFileDir, fileDir)
+
+        # Older caches of the layout (another version of the file, other aisles or config) are stale
+        pattern = re.escape(self._getCachePrefix()) + '[0-9a-f]{16}\\.npz'
+        for name in os.listdir(cacheDir):
+            oldFileDir = os.path.join(cacheDir, name)
+            if re.fullmatch(pattern, name) and oldFileDir != fileDir:
+                try:
+                    os.remove(oldFileDir)
+                except OSError:
+                    pass # removed by another process
+
+    def _loadPairDistance(self, cacheDir):
+        """
+        Load the distance matrices saved by self._savePairDistance()
+        :return: False if there is no valid cache for the current layout and aisles
+        """
+        key = self._getCacheKey()
+        fileDir = self._getCacheFileDir(cacheDir, key)
+        if not os.path.exists(fileDir):
+            return False
+        try:
+            with np.load(fileDir) as data:
+                if str(data['cacheKey']) != key:
+                    return False
+                nRegions = len(self.aisles_x) + 1
+                regionKeys = [data['keys_' + str(cls)] for cls in range(nRegions)]
+                pairDistMat = [data['dist_' + str(cls)] for cls in range(nRegions)]
+                forkPairMask = [data['fork_' + str(cls)] for cls in range(nRegions)]
+                if self.kNearest is not None or self.maxDistance is not None:
+                    prunedPairs = [(data['idx1_' + str(cls)], data['idx2_' + str(cls)], pairDistMat[cls],
+                                    forkPairMask[cls]) for cls in range(nRegions)]
+        except (OSError, KeyError, ValueError):
+            return False # broken cache, rebuild it
+
+        self.regionKeys = regionKeys
+        if self.kNearest is not None or self.maxDistance is not None:
+            self.prunedPairs = prunedPairs
+        else:
+            self.pairDistMat = pairDistMat
+            self.forkPairMask = forkPairMask
+        self.posPairs = [self._getRegionPairs(cls) for cls in range(nRegions)]
+        return True
+
 if __name__ == '__main__':
     print(Tools.xor(1,0))
     # pkl = PickingLogic()
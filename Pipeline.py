@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+from PickingObj import PickingObj
+from Picking import Picking
+from Orders import OrderStream
+
+class Pipeline:
+    # Keys of the config file and their default values
+    defaults = {
+        'layout': 'layout.csv',              # layout file, see PalletPos.ReadLocationFromCSV()
+        'aisles_x': [145.5, 265.5],          # x of the vertical aisles
+        'bondAisles_x': [145.5, 265.5],      # x of the boundaries of regions
+        'cacheDir': None,                    # cache of pair distances, see PickingObj.getPairDistance()
+        'kNearest': None,                    # pruning of pair distances, see PickingObj.getPairDistance()
+        'maxDistance': None,
+        'backend': 'route',                  # 'route' or 'graph' (Class: AisleGraph)
+        'orders': [],                        # order files (.csv), see OrderStream.readDays()
+        'slotter': 'Newest Slotter.csv',     # SKU -> Location, see OrderStream
+        'chunksize': 100000,
+        'ifSortedByDate': True,
+        'dateFormat': None,
+        'engine': 'array',                   # see (Class: Picking)
+        'batching': 'greedy',
+        'output': 'results',                 # directory of the results
+        'routeFormat': 'npy',                # route table of each day: 'npy', 'csv' or None (not saved)
+        'render': False,                     # draw every route of each day (imports matplotlib)
+    }
+
+    def __init__(self, config=None):
+        """
+        Plan the routes of every day of the order files:
+        load layout -> build/load pair distances -> read orders -> plan each day -> write results
+        :param config: (dict) see Pipeline.defaults, missing keys take the default values
+        """
+        config = dict(config or {})
+        unknown = set(config) - set(self.defaults)
+        if unknown:
+            raise ValueError('unknown keys in config: ' + ', '.join(sorted(unknown)))
+        self.config = dict(self.defaults, **config)
+        self.pko = None
+        self.render = None
+        self.times = {} # seconds of each stage
+
+    @classmethod
+    def fromFile(cls, fileDir):
+        with open(fileDir) as f:
+            return cls(json.load(f))
+
+    def loadLayout(self):
+        config = self.config
+        start = time.time()
+        self.pko = PickingObj(aisles_x=config['aisles_x'], layoutFileDir=config['layout'],
+                              bondAisles_x=config['bondAisles_x'])
+        self.pko.getPosClass()
+        self._record('layout', start)
+
+        start = time.time()
+        self.pko.getPairDistance(cacheDir=config['cacheDir'], kNearest=config['kNearest'],
+                                 maxDistance=config['maxDistance'], backend=config['backend'])
+        self._record('pair distance', start)
+        return self.pko
+
+    def planDay(self, df):
+        pk = Picking(self.pko, df, self.config['engine'], batching=self.config['batching'])
+        pk.picking()
+        return pk
+
+    def run(self):
+        """
+        :return: (pd.DataFrame) one row per day: date | routes | travel distance | layers
+        """
+        config = self.config
+        if self.pko is None:
+            self.loadLayout()
+        os.makedirs(config['output'], exist_ok=True)
+        if config['render']:
+            from Render import Render # matplotlib is only imported if the routes are drawn
+            self.render = Render(self.pko)
+
+        stream = OrderStream(self.pko, config['slotter'], chunksize=config['chunksize'],
+                             ifSortedByDate=config['ifSortedByDate'], dateFormat=config['dateFormat'])
+        rows = []
+        start = time.time()
+        for df in stream.readDays(config['orders']):
+            date = df['date'].iloc[0]
+            pk = self.planDay(df)
+            rows.append([date, sum(len(routes) for routes in pk.Routes), pk.travelDistance, int(df['layers'].sum())])
+            if config['routeFormat'] is not None:
+                pk.saveRouteTable(os.path.join(config['output'], 'routes_' + date + '.' + config['routeFormat']))
+            if self.render is not None:
+                self.render.renderRoutes(pk.Routes, os.path.join(config['output'], 'routes_' + date))
+        self._record('planning', start)
+
+        summary = pd.DataFrame(rows, columns=['date', 'routes', 'travel distance', 'layers'])
+        summary.to_csv(os.path.join(config['output'], 'summary.csv'), index=False)
+        return summary
+
+    def _record(self, stage, start):
+        self.times[stage] = self.times.get(stage, 0) + time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan the layer picking routes of every day of the order files')
+    parser.add_argument('config', help='.json file, see Pipeline.defaults for the keys')
+    parser.add_argument('--output', help='directory of the results (overrides the config)')
+    parser.add_argument('--render', action='store_true', help='also draw every route (overrides the config)')
+    args = parser.parse_args()
+
+    pipeline = Pipeline.fromFile(args.config)
+    if args.output is not None:
+        pipeline.config['output'] = args.output
+    if args.render:
+        pipeline.config['render'] = True
+    summary = pipeline.run()
+    print(summary.to_string(index=False))
+    print('total travel distance', summary['travel distance'].sum())
+    print({stage: round(seconds, 3) for stage, seconds in pipeline.times.items()})
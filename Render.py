@@ -0,0 +1,199 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection
+from matplotlib.figure import Figure
+import matplotlib.patches as patches
+
+# Render of the worker processes, so that each worker draws its base layout only once
+_render = None
+
+def _initWorker(render):
+    global _render
+    _render = render
+
+def _renderDay(args):
+    Routes, outputDir, prefix = args
+    return _render.renderRoutes(Routes, outputDir, prefix)
+
+
+class Render:
+    # Geometry of the figures, same as the plotting methods of (Class: Route) and (Class: PalletPos)
+    w = 4.5
+    h = 4.5
+    figsize = (15, 1.763)
+    colors = ['black', 'red', 'orange', 'green', 'blue', 'purple', 'brown', 'olive']
+    linestyles = ['solid', (0, (5, 3)), (0, (5, 6)), 'dotted']
+
+    def __init__(self, pko, dpi=100):
+        """
+        Draw layouts, heat maps and routes to image files, without any window (Agg canvas),
+        the layout is drawn once and reused by every figure of routes
+        :param pko: object created from (Class: PickingObj)
+        """
+        self.pko = pko
+        self.dpi = dpi
+        self.names = pko.registry.names
+        self.coords = pko.registry.coords
+        # Same lines as the pair distances of pko, so the routes drawn are the ones planned
+        ybot, ytop = pko.ybot, pko.ytop
+        self.ybot, self.ytop = ybot, ytop
+        self.ymid = (ybot+ytop)/2
+        xs = self.coords[:, 0]
+        self.xlim = (min(-0.5, np.nanmin(xs) - self.w), max(411.5, np.nanmax(xs) + self.w))
+        self.ylim = (-0.5, 42.5)
+
+        # Update through self.getBaseFigure()
+        self._fig = None
+        self._ax = None
+
+    @classmethod
+    def getLayoutCollection(cls, posValues, ymid, colors=None):
+        """
+        All the pallet positions as a single collection of rectangles
+        :param posValues: array (n, 2) of central locations [x, y]
+        :param ymid: y of the middle line, whose positions are twice as high
+        :param colors: color of each position (None: default color)
+        """
+        posValues = np.asarray(posValues, dtype=float)
+        keep = ~np.isnan(posValues).any(axis=1) # positions without location are not drawn
+        posValues = posValues[keep]
+        heights = np.where(posValues[:, 1] == ymid, 2*cls.h, cls.h)
+        rects = [patches.Rectangle((x - 0.45*cls.w, y - height/2), 0.9*cls.w, height)
+                 for (x, y), height in zip(posValues.tolist(), heights.tolist())]
+        if colors is None:
+            return PatchCollection(rects, facecolor='C0')
+        colors = [color for color, k in zip(colors, keep.tolist()) if k]
+        return PatchCollection(rects, facecolor=colors, edgecolor=colors)
+
+    def _newFigure(self):
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_xlim(*self.xlim)
+        ax.set_ylim(*self.ylim)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        return fig, ax
+
+    def getBaseFigure(self):
+        """
+        :return: (fig, ax) the layout figure, drawn only once
+        """
+        if self._fig is None:
+            self._fig, self._ax = self._newFigure()
+            self._ax.add_collection(self.getLayoutCollection(self.coords, self.ymid))
+        return self._fig, self._ax
+
+    def renderLayout(self, fileDir='layout_init.png'):
+        fig, ax = self.getBaseFigure()
+        fig.savefig(fileDir, bbox_inches='tight')
+
+    def renderHeatMap(self, freqDict, fileDir='heatmap.png', n_classes=7):
+        """
+        :param freqDict: {'Position': frequency}, e.g. PalletPos.freqDict
+        """
+        import seaborn
+        freq = np.array(list(freqDict.values()))
+        classes = dict(zip(freqDict.keys(), self.pko.Route.palletPos._divideIntoClasses(freq, n_classes).tolist()))
+        palette = list(seaborn.color_palette("Reds", n_colors=n_classes))
+        colors = [palette[classes[pos]] if pos in classes else 'grey' for pos in self.names.tolist()]
+
+        fig, ax = self._newFigure()
+        ax.add_collection(self.getLayoutCollection(self.coords, self.ymid, colors))
+        fig.savefig(fileDir, bbox_inches='tight')
+
+    def getRoutePoints(self, route):
+        """
+        :param route: [[name1, name2, forkLoc, distance], ...] (a route of (Class: Picking).Routes)
+        :return: list of points [[x, y], ...] along each leg
+        """
+        # [['Position']]: picked alone, no leg
+        return [self.pko.Route.getLegPoints(leg, self.pko.positions, self.ybot, self.ytop)
+                for leg in route if len(leg) >= 4]
+
+    def renderRoute(self, route, fileDir='layout_update.png', title=None):
+        """
+        Draw a route (of any number of legs) on the layout
+        :return: distance of the route
+        """
+        fig, ax = self.getBaseFigure()
+        lines = []
+        for i, points in enumerate(self.getRoutePoints(route)):
+            points = np.array(points)
+            lines += ax.plot(points[:, 0], points[:, 1], color=self.colors[i % len(self.colors)],
+                             linestyle=self.linestyles[i % len(self.linestyles)], linewidth=2.5,
+                             label="route {}".format(i))
+        legend = ax.legend() if len(lines) > 0 else None
+        if title is not None:
+            ax.set_title(title)
+        fig.savefig(fileDir, bbox_inches='tight')
+
+        # Clean up the base figure for the next route
+        for line in lines:
+            line.remove()
+        if legend is not None:
+            legend.remove()
+        ax.set_title('')
+        return sum(leg[3] for leg in route if len(leg) > 3)
+
+    def renderRoutes(self, Routes, outputDir='.', prefix=''):
+        """
+        Draw every route of a day, one file per route: <prefix>region<cls>_route<i>.png
+        :param Routes: (Class: Picking).Routes
+        :return: names of the files
+        """
+        os.makedirs(outputDir, exist_ok=True)
+        fileDirs = []
+        for cls, routes in enumerate(Routes):
+            for i, route in enumerate(routes):
+                fileDir = os.path.join(outputDir, prefix + 'region' + str(cls) + '_route' + str(i) + '.png')
+                self.renderRoute(route, fileDir, title='region {} route {}'.format(cls, i))
+                fileDirs.append(fileDir)
+        return fileDirs
+
+    def renderDays(self, days, outputDir='.', workers=1):
+        """
+        Draw the routes of many days, the days are drawn in parallel if workers > 1
+        :param days: list of (date, Routes)
+        :return: names of the files of each day
+        """
+        args = [(Routes, outputDir, str(date) + '_') for date, Routes in days]
+        global _render
+        if workers <= 1 or len(args) <= 1:
+            _render = self
+            return [_renderDay(arg) for arg in args]
+        # Forked workers inherit _render from this process, otherwise it is pickled once per worker
+        self._fig = self._ax = None
+        ctx = multiprocessing.get_context()
+        if ctx.get_start_method() == 'fork':
+            _render = self
+            pool = ProcessPoolExecutor(workers, mp_context=ctx)
+        else:
+            pool = ProcessPoolExecutor(workers, mp_context=ctx, initializer=_initWorker, initargs=(self,))
+        with pool:
+            return list(pool.map(_renderDay, args))
+
+
+if __name__ == '__main__':
+    import sys
+    from PickingObj import PickingObj
+    from Picking import Picking
+    import pandas as pd
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rng = np.random.default_rng(0)
+    days = []
+    for date in ['2022-02-21', '2022-02-22']:
+        df = pd.DataFrame({'Location': rng.choice(pko.posKeys, size=40, replace=False),
+                           'layers': rng.integers(1, 13, size=40)})
+        df['Class'] = df['Location'].map(pko.posClsDict)
+        pk = Picking(pko, df)
+        pk.picking()
+        days.append((date, pk.Routes))
+    outputDir = sys.argv[1] if len(sys.argv) > 1 else 'routes'
+    fileDirs = Render(pko).renderDays(days, outputDir, workers=2)
+    print(sum(len(f) for f in fileDirs), 'files in', outputDir)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from WarehouseObj import PosRegistry
+
+class Reslotting:
+    def __init__(self, pko, freqFileDir='freq_post.csv', skuFileDir='locationToSKU.csv'):
+        """
+        Improve the slotting (SKU of each position) by swapping SKUs between positions,
+        minimizing the expected travel f^T D f, where
+        - f[p]: frequency (layers picked) of the SKU stored in position p, 0 if empty
+        - D[p, q]: distance between positions p and q (min over forkLoc), 0 if in different regions
+        frequent SKUs are then stored close to each other, so that they are paired in shorter routes
+        :param pko: object created from (Class: PickingObj), with pair distances calculated
+        :param freqFileDir: .csv file of frequencies of positions, see PalletPos.ReadFrequencyFromCSV()
+        :param skuFileDir: .csv file of SKUs of positions, see PalletPos.ReadSKUPositionFromCSV()
+        """
+        self.pko = pko
+        self.registry = PosRegistry(pko.posKeys, pko.posValues)
+        self.registry.ReadFrequencyFromCSV(freqFileDir)
+        self.registry.ReadSKUPositionFromCSV(skuFileDir)
+        self.SKUs = self.registry.SKUs.copy()  # SKUs[ID]: SKU stored in the position, '' if empty
+        self.f = np.where(self.SKUs != '', np.nan_to_num(self.registry.freqs), 0.0)
+
+        # Distances of all positions, block diagonal by region
+        n = len(self.registry)
+        self.D = np.zeros((n, n))
+        self.movable = np.zeros(n, dtype=bool) # positions located in a region
+        for cls, ids in enumerate(pko.regionIds):
+            if len(ids) == 0:
+                continue
+            r = np.arange(len(ids))
+            dist, isFork = pko.getRegionDistances(cls, np.repeat(r, len(ids)), np.tile(r, len(ids)))
+            self.D[np.ix_(ids, ids)] = np.min(dist, axis=0).reshape(len(ids), len(ids))
+            self.movable[ids] = True
+        self.movable &= ~np.isnan(self.registry.coords).any(axis=1)
+        self.D[np.isnan(self.D)] = 0
+        np.fill_diagonal(self.D, 0)
+
+        self.g = self.D @ self.f
+        self.objective = self.f @ self.g
+        self.swaps = [] # [(name1, name2, change of objective), ...]
+
+    def getSwapDeltas(self, p):
+        """
+        Change of the objective by swapping the SKUs of position p and each position q, at once:
+        with d = f[p] - f[q], f becomes f + d (e_q - e_p), and
+        delta[q] = 2 d (g[q] - g[p]) - 2 d^2 D[p, q], where g = D f
+        :param p: ID of position
+        :return: array of changes (inf for the positions which could not be swapped)
+        """
+        d = self.f[p] - self.f
+        delta = 2 * d * (self.g - self.g[p]) - 2 * d**2 * self.D[p]
+        delta[~self.movable | (d == 0)] = np.inf
+        delta[p] = np.inf
+        return delta
+
+    def swap(self, p, q):
+        # Swap the SKUs of positions p and q, and update g and the objective
+        d = self.f[p] - self.f[q]
+        self.objective += 2 * d * (self.g[q] - self.g[p]) - 2 * d**2 * self.D[p, q]
+        self.g += d * (self.D[:, q] - self.D[:, p])
+        self.f[[p, q]] = self.f[[q, p]]
+        self.SKUs[[p, q]] = self.SKUs[[q, p]]
+
+    def optimize(self, maxRounds=20, seed=0, tol=1e-9):
+        """
+        Local search: visit the positions in random order and make the best swap of each,
+        until a round makes no swap that improves the objective more than tol (relative)
+        Moving an SKU to an empty position is a swap with f[q] = 0
+        :return: objective after each round
+        """
+        rng = np.random.default_rng(seed)
+        names = self.registry.names
+        objectives = [self.objective]
+        for r in range(maxRounds):
+            nSwaps = 0
+            for p in rng.permutation(np.flatnonzero(self.movable)):
+                delta = self.getSwapDeltas(p)
+                q = int(np.argmin(delta))
+                if delta[q] < -tol * abs(self.objective):
+                    self.swaps.append((names[p], names[q], delta[q]))
+                    self.swap(p, q)
+                    nSwaps += 1
+            objectives.append(self.objective)
+            if nSwaps == 0:
+                break
+        return objectives
+
+    def saveSKUPosition(self, fileDir='locationToSKU_opt.csv'):
+        """
+        Write the new slotting in the same format as "locationToSKU.csv"
+        |Location   |New Item      |
+        |-----------|--------------|
+        |801-01-A-01|36241-77617-03|
+        """
+        has = self.SKUs != ''
+        df = pd.DataFrame({'Location': self.registry.names[has], 'New Item': self.SKUs[has]})
+        df.to_csv(fileDir, index=False)
+        return df
+
+
+if __name__ == '__main__':
+    from PickingObj import PickingObj
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rs = Reslotting(pko)
+    print('objective', rs.optimize())
+    print(len(rs.swaps), 'swaps')
+    rs.saveSKUPosition('locationToSKU_opt.csv')
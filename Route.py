@@ -1,10 +1,13 @@
-import matplotlib.patches as patches
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from WarehouseObj import PalletPos
 
 class Route:
+    # Geometry of the layout
+    w = 4.5 # width of pallet position
+    h = 4.5 # height of pallet position
+    a = 12  # width of aisle
+
     def __init__(self, aisles_x, layoutFileDir='layout.csv'):
         self.palletPos = PalletPos()
         
@@ -15,39 +18,34 @@ class Route:
         # x-coordinates of vertical aisles
         self.aisles_x = aisles_x
 
-    def PlotLayout(self):
+        # Layout lines (the same ones for (Class: PickingObj), see PalletPos.getLines()), and memo of self.getDistance()
+        self.ybot, self.ytop = self.palletPos.getLines()
+        self._distCache = {}
+
+    def PlotLayout(self, fileDir='layout_init.png'):
         """
-        Plot and save the initial layout into file "layout_init.png"
+        Plot and save the initial layout into file fileDir
         :return: None
         """
+        # Plotting libraries are only imported when plotting, so that batch jobs start fast
+        import matplotlib.pyplot as plt
+        from Render import Render
         fig, ax = plt.subplots(figsize=(15, 1.763))
         ax.set_xlim(-0.5, 411.5)
         ax.set_ylim(-0.5, 42.5)
         ax.set_xticks([])
         ax.set_yticks([])
-        w = 4.5
-        h = 4.5
 
         # 读取 dictionary 类型的数据 ({"Name of position": [x,y]})
         Positions = self.palletPos.locDict
         Positions_values = np.array(list(Positions.values()))
-        ybot = np.min(Positions_values[:,-1])
-        ytop = np.max(Positions_values[:,-1])
+        ybot, ytop = self.ybot, self.ytop
         ymid = (ybot+ytop)/2
 
-        for [x, y] in Positions_values:
-            height = h
-            # 如果在中间行，高度*2
-            if y == ymid:
-                height = 2*h
-            ax.add_patch(patches.Rectangle(
-                (x - 0.45*w, y - height/2),  # (x,y)
-                0.9*w, # width
-                height # height
-            ))
-        fig.savefig('layout_init.png', bbox_inches='tight')
+        ax.add_collection(Render.getLayoutCollection(Positions_values, ymid))
+        fig.savefig(fileDir, bbox_inches='tight')
 
-    def PlotLayoutAndRoute(self, p1, p2, forkLoc=0)->float:
+    def PlotLayoutAndRoute(self, p1, p2, forkLoc=0, fileDir='layout_update.png')->float:
         """
         Plot the route from p1 to p2 (p2 could be a list of points) and calculate the total distance
         :param p1: name of source point e.g. "point1"
@@ -56,45 +54,36 @@ class Route:
         :param forkLoc: when travelling from the middle line, it's optional to indicate whether travel from upper side or bottom side
             forkLoc = 0(default): travel from bottom
             forkloc = 1: travel from upper side
+        :param fileDir: file to save the figure
         :return: distance of route
         """
+        import matplotlib.pyplot as plt
+        from Render import Render
         fig, ax = plt.subplots(figsize=(15, 1.763))
         ax.set_xlim(-0.5, 411.5)
         ax.set_ylim(-0.5, 42.5)
         ax.set_xticks([])
         ax.set_yticks([])
-        w = 4.5
-        h = 4.5
 
         # 读取 dictionary 类型的数据 ({"Name of position": [x,y]})
         Positions = self.palletPos.locDict
         Positions_values = np.array(list(Positions.values()))
-        ybot = np.min(Positions_values[:,-1])
-        ytop = np.max(Positions_values[:,-1])
+        ybot, ytop = self.ybot, self.ytop
         ymid = (ybot+ytop)/2
 
         #
         # Plot layout
         #
-        for [x, y] in Positions_values:
-            height = h
-            # 如果在中间行，高度*2
-            if y == ymid:
-                height = 2*h
-            ax.add_patch(patches.Rectangle(
-                (x - 0.45*w, y - height/2),  # (x,y)
-                0.9*w, # width
-                height # height
-            ))
+        ax.add_collection(Render.getLayoutCollection(Positions_values, ymid))
 
         #
         # Plot route
         #
         p2s = p2.split(",")
         distance_sum = 0
-        # 目前最多支持四条子路径
-        colors = ['black','red','orange','green']
-        linestyles = ['solid', (0, (5, 3)), (0, (5, 6)), 'dotted']
+        # 子路径数量不限, 颜色和线型循环使用
+        colors = Render.colors
+        linestyles = Render.linestyles
         for i in range(len(p2s)):
             if i == 0:
                 p2 = p2s[i]
@@ -103,12 +92,185 @@ class Route:
                 p1, p2 = p2s[i-1], p2s[i]
                 route, nextForkLoc = self.getRoute(Positions[p1], Positions[p2], ybot, ytop, nextForkLoc)
             route = np.array(route)
-            ax.plot(route[:, 0], route[:, 1], color=colors[i], linestyle=linestyles[i], linewidth=2.5, label="route {}".format(i))
+            ax.plot(route[:, 0], route[:, 1], color=colors[i % len(colors)],
+                    linestyle=linestyles[i % len(linestyles)], linewidth=2.5, label="route {}".format(i))
             distance_sum += self.calculateRoute(route)
         ax.legend()
-        fig.savefig('layout_update.png', bbox_inches='tight')
+        fig.savefig(fileDir, bbox_inches='tight')
+        return distance_sum
+
+    def getRouteDistances(self, pos1, pos2, ymin, ymax, forkLoc=0):
+        """
+        Vectorized version of self.calculateRoute(self.getRoute(...)) for many routes at once.
+        It goes through the same waypoints as self.getRoute(), so the distances are identical.
+        :param pos1: array of shape (..., 2), central locations of the source pallets
+        :param pos2: array of shape (..., 2), central locations of the destination pallets
+        :param ymin: y value of bottom line
+        :param ymax: y value of top line
+        :param forkLoc: 0 or 1, side of the middle line from which the source pallets are picked
+        :return: array of distances, broadcast from the shapes of pos1 and pos2
+        """
+        pos1 = np.asarray(pos1, dtype=float)
+        pos2 = np.asarray(pos2, dtype=float)
+        x1, y1 = pos1[..., 0], pos1[..., 1]
+        x2, y2 = pos2[..., 0], pos2[..., 1]
+        x1, y1, x2, y2 = np.broadcast_arrays(x1, y1, x2, y2)
+
+        h, a = self.h, self.a
+        ymid = (ymin + ymax) / 2
+
+        # y values of the first two points (p1, p2) and the last two points (pm2, pm1) of the route
+        # (1) p1, p2 in the same line
+        if not forkLoc:
+            midP1y, midP2y = y1 - h, y1 - h - a / 2
+        else:
+            midP1y, midP2y = y1 + h, y1 + h + a / 2
+        p1y = np.where(y1 == ymin, y1 + h / 2, np.where(y1 == ymax, y1 - h / 2, midP1y))
+        p2y = np.where(y1 == ymin, y1 + h / 2 + a / 2, np.where(y1 == ymax, y1 - h / 2 - a / 2, midP2y))
+        pm1y, pm2y = p1y, p2y
+
+        # (2) p1, p2 not in the same line, and p1 not in the middle line
+        sign1 = np.where(y1 > y2, -1, 1)
+        sign2 = -sign1
+        p1y_ = y1 + sign1 * h / 2
+        p2y_ = y1 + sign1 * (h / 2 + a / 2)
+        pm1y_ = np.where(y2 != ymid, y2 + sign2 * h / 2, y2 + sign2 * h)
+        pm2y_ = np.where(y2 != ymid, y2 + sign2 * (h / 2 + a / 2), y2 + sign2 * (h + a / 2))
+
+        # (3) p1, p2 not in the same line, and p1 in the middle line
+        pm1y__ = np.where(y2 > y1, y2 - h / 2, y2 + h / 2)
+        pm2y__ = np.where(y2 > y1, y2 - h / 2 - a / 2, y2 + h / 2 + a / 2)
+
+        diffRow = y1 != y2
+        fromMid = diffRow & (y1 == ymid)
+        fromSide = diffRow & (y1 != ymid)
+        p1y = np.where(fromSide, p1y_, p1y)
+        p2y = np.where(fromSide, p2y_, p2y)
+        pm1y = np.where(fromSide, pm1y_, np.where(fromMid, pm1y__, pm1y))
+        pm2y = np.where(fromSide, pm2y_, np.where(fromMid, pm2y__, pm2y))
+
+        # The aisle closest to the mean of two x values (the last one wins ties, same as self.getRoute())
+        aisles = np.asarray(self.aisles_x, dtype=float)
+        aisleDist = np.abs((x1 + x2)[..., None] / 2 - aisles)
+        closest_ax = aisles[len(aisles) - 1 - np.argmin(aisleDist[..., ::-1], axis=-1)]
+
+        # Sum up the segments in the same order as self.calculateRoute()
+        # (1) p2, pm2 in the same line: [p1, p2, pm2, pm1]
+        # (2) otherwise: [p1, p2, p3, pm3, pm2, pm1]
+        dist4 = np.abs(p2y - p1y) + np.abs(x2 - x1) + np.abs(pm1y - pm2y)
+        dist6 = np.abs(p2y - p1y) + np.abs(closest_ax - x1) + np.abs(pm2y - p2y) + np.abs(x2 - closest_ax) \
+                + np.abs(pm1y - pm2y)
+        return np.where(p2y == pm2y, dist4, dist6)
+
+    def getDistance(self, pos1, pos2, ymin=None, ymax=None, forkLoc=0):
+        """
+        Distance of the route from pos1 to pos2, same as self.calculateRoute(self.getRoute(...)),
+        but in closed form (sum of the horizontal and vertical segments) without the waypoints,
+        memoized by (x1, y1, x2, y2, forkLoc) for each (ymin, ymax, aisles)
+        :param ymin, ymax: y values of bottom and top line (None: those of the layout), should be finite
+        :return:
+            distance: distance of route (nan if a position has no location, not memoized)
+            forkLoc: side of the middle line where the next route starts (see self.getRoute())
+        """
+        ymin = self.ybot if ymin is None else ymin
+        ymax = self.ytop if ymax is None else ymax
+        if not (np.isfinite(ymin) and np.isfinite(ymax)):
+            raise ValueError('the bottom and top lines should be finite, got ' + repr((ymin, ymax)))
+        x1, y1 = pos1
+        x2, y2 = pos2
+        ymid = (ymin+ymax)/2
+        cache = self._distCache.setdefault((float(ymin), float(ymax), tuple(self.aisles_x)), {})
+        key = (x1, y1, x2, y2, forkLoc)
+        if key in cache:
+            return cache[key]
+
+        h, a = self.h, self.a
+        nextForkLoc = forkLoc
+        # y values of the first two points (p1, p2) and the last two points (pm2, pm1) of the route
+        if y1 == y2:
+            if y1 == ymin:
+                p1y, p2y = y1+h/2, y1+h/2+a/2
+            elif y1 == ymax:
+                p1y, p2y = y1-h/2, y1-h/2-a/2
+            elif not forkLoc:
+                p1y, p2y = y1-h, y1-h-a/2
+            else:
+                p1y, p2y = y1+h, y1+h+a/2
+            pm1y, pm2y = p1y, p2y
+        elif y1 != ymid:
+            nextForkLoc = 1 if (y1 > y2) and (y2 == ymid) else 0
+            sign1, sign2 = (-1, 1) if y1 > y2 else (1, -1)
+            p1y, p2y = y1 + sign1*h/2, y1 + sign1*(h/2+a/2)
+            if y2 != ymid:
+                pm1y, pm2y = y2 + sign2*h/2, y2 + sign2*(h/2+a/2)
+            else:
+                pm1y, pm2y = y2 + sign2*h, y2 + sign2*(h+a/2)
+        else:
+            nextForkLoc = 0
+            p1y, p2y = (y1-h, y1-h-a/2) if not forkLoc else (y1+h, y1+h+a/2)
+            pm1y, pm2y = (y2-h/2, y2-h/2-a/2) if y2 > y1 else (y2+h/2, y2+h/2+a/2)
+
+        # Sum up the segments in the same order as self.calculateRoute()
+        if p2y == pm2y:
+            distance = abs(p2y-p1y) + abs(x2-x1) + abs(pm1y-pm2y)
+        else:
+            # The aisle closest to the mean of two x values (the last one wins ties)
+            min_dist = 1e10
+            closest_ax = 1e10
+            for ax in self.aisles_x:
+                if abs((x1+x2)/2-ax) <= min_dist:
+                    min_dist = abs((x1+x2)/2-ax)
+                    closest_ax = ax
+            distance = abs(p2y-p1y) + abs(closest_ax-x1) + abs(pm2y-p2y) + abs(x2-closest_ax) + abs(pm1y-pm2y)
+        if np.isnan(distance):
+            return distance, nextForkLoc
+        cache[key] = (distance, nextForkLoc)
+        return cache[key]
+
+    def getSequenceDistance(self, names, forkLoc=0, positions=None)->float:
+        """
+        Distance of a route visiting the positions in order, the legs are connected just like
+        self.PlotLayoutAndRoute() (forkLoc of each leg from the last one), but without plotting
+        :param names: names of positions, e.g. ["point1", "point2", "point3"], of any length
+        :param forkLoc: side of the middle line where the first leg starts
+        :param positions: {"Name of position": [x,y]} (None: self.palletPos.locDict),
+            e.g. PickingObj.positions for the corrected names
+        :return: distance of route
+        """
+        positions = self.palletPos.locDict if positions is None else positions
+        distance_sum = 0
+        for i in range(1, len(names)):
+            distance, forkLoc = self.getDistance(positions[names[i-1]], positions[names[i]], forkLoc=forkLoc)
+            distance_sum += distance
         return distance_sum
 
+    def getSequenceDistances(self, sequences, forkLoc=0, positions=None):
+        """
+        :param sequences: list of lists of names of positions
+        :return: array of distances of routes, see self.getSequenceDistance()
+        """
+        return np.array([self.getSequenceDistance(names, forkLoc, positions) for names in sequences], dtype=float)
+
+    def getLegPoints(self, leg, positions=None, ymin=None, ymax=None)->list:
+        """
+        Points along a leg of (Class: Picking).Routes, the route of its distance in PickingObj.posPairs
+        :param leg: [name1, name2, forkLoc(-1 if not a fork pair), distance]
+        :param positions: {"Name of position": [x,y]} (None: self.palletPos.locDict),
+            e.g. PickingObj.positions for the corrected names
+        :param ymin, ymax: y values of bottom and top line (None: those of the layout)
+        :return: route: [[p1x,p1y], [p2x,p2y],...], see self.getRoute()
+        """
+        positions = self.palletPos.locDict if positions is None else positions
+        ymin = self.ybot if ymin is None else ymin
+        ymax = self.ytop if ymax is None else ymax
+        ymid = (ymin+ymax)/2
+        p1, p2 = positions[leg[0]], positions[leg[1]]
+        # Just like PickingObj.getPairDistance(), routes of fork pairs start from the middle line
+        if p2[1] == ymid and p1[1] != ymid:
+            p1, p2 = p2, p1
+        route, nextForkLoc = self.getRoute(p1, p2, ymin, ymax, max(leg[2], 0))
+        return route
+
     def calculateRoute(self, route):
         dist_sum = 0
         for p in range(1, len(route)):
@@ -132,9 +294,7 @@ class Route:
         x1, y1 = pos1
         x2, y2 = pos2
 
-        w = 4.5 # width of pallet position
-        h = 4.5 # height of pallet position
-        a = 12  # width of aisle
+        h, a = self.h, self.a
 
         # 如果p1,p2在同一行: 构造四个点
         if y1 == y2:
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from PickingObj import PickingObj
+from Simulation import Simulation
+
+def _buildScenario(args):
+    layoutFileDir, aisles_x, bondAisles_x, skuFileDir, cacheDir = args
+    start = time.time()
+    pko = PickingObj(aisles_x=aisles_x, layoutFileDir=layoutFileDir, bondAisles_x=bondAisles_x)
+    pko.getPosClass()
+    pko.getPairDistance(cacheDir=cacheDir)
+    if skuFileDir is not None:
+        pko.getSKUPosDict(fileDir=skuFileDir)
+    return pko, time.time() - start
+
+
+class Scenario:
+    def __init__(self, configs, workers=1, cacheDir=None, engine='array'):
+        """
+        :param configs: list of (layoutFileDir, aisles_x, bondAisles_x) or
+            (layoutFileDir, aisles_x, bondAisles_x, skuFileDir) for each scenario
+            e.g. [('layout.csv', [145.5, 265.5], [145.5, 265.5], 'locationToSKU.csv'),
+                  ('layout_new.csv', [60.75, 145.5, 265.5, 332.25], [145.5, 265.5], 'locationToSKU_new.csv')]
+            with skuFileDir, orders are located by their 'New Item' through pko.SKUPosDict,
+            otherwise by their 'Location'
+        :param workers: number of processes to build the scenarios and to replay the days
+        :param cacheDir: cache of pair distances, see PickingObj.getPairDistance()
+        """
+        self.configs = [tuple(config) + (None,) * (4 - len(config)) for config in configs]
+        self.workers = workers
+        self.cacheDir = cacheDir
+        self.engine = engine
+
+        # Update through self.build()
+        self.pkos = []
+        self.buildTimes = []
+
+    def build(self):
+        """
+        Create the PickingObj (with pair distances) of every scenario, in parallel if workers > 1
+        """
+        args = [config + (self.cacheDir,) for config in self.configs]
+        if self.workers <= 1 or len(args) <= 1:
+            results = [_buildScenario(arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(min(self.workers, len(args))) as pool:
+                results = list(pool.map(_buildScenario, args))
+        self.pkos = [pko for pko, t in results]
+        self.buildTimes = [t for pko, t in results]
+
+    def evaluate(self, df):
+        """
+        Replay the same orders in every scenario
+        :param df: orders of many days as (pd.DataFrame) with the columns 'date', 'layers',
+            and 'New Item' or 'Location' (see configs)
+        :return:
+            summary: (pd.DataFrame) one row per scenario with its total travel distance and timing
+            daily: (pd.DataFrame) results of Simulation.simulateDays() of all the scenarios
+        """
+        if len(self.pkos) != len(self.configs):
+            self.build()
+
+        summary = []
+        daily = []
+        for i, (config, pko) in enumerate(zip(self.configs, self.pkos)):
+            layoutFileDir, aisles_x, bondAisles_x, skuFileDir = config
+            orders = df.drop(columns=['Class'], errors='ignore')
+            if skuFileDir is not None:
+                orders = orders.assign(Location=orders['New Item'].astype(str).map(pko.SKUPosDict))
+            located = orders['Location'].isin(pko.posClsDict.keys())
+
+            start = time.time()
+            days = Simulation(pko, workers=self.workers, engine=self.engine).simulateDays(orders[located])
+            replayTime = time.time() - start
+
+            days.insert(0, 'scenario', i)
+            daily.append(days)
+            summary.append([i, layoutFileDir, list(aisles_x), list(bondAisles_x), len(days),
+                            days['routes'].sum(), days['travel distance'].sum(), days['layers'].sum(),
+                            orders.loc[~located, 'layers'].sum(), self.buildTimes[i], replayTime])
+
+        summary = pd.DataFrame(summary, columns=['scenario', 'layout', 'aisles_x', 'bondAisles_x', 'days',
+                                                 'routes', 'travel distance', 'layers', 'unlocated layers',
+                                                 'build time', 'replay time'])
+        return summary, pd.concat(daily, ignore_index=True)
+
+
+if __name__ == '__main__':
+    import numpy as np
+    sc = Scenario([('layout.csv', [145.5, 265.5], [145.5, 265.5], 'locationToSKU.csv'),
+                   ('layout_new.csv', [60.75, 145.5, 265.5, 332.25], [145.5, 265.5], 'locationToSKU_new.csv')],
+                  workers=2)
+    skus = pd.read_csv('locationToSKU.csv')['New Item'].astype(str).values
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'date': rng.choice(['2022-02-2' + str(d) for d in range(1, 8)], size=400),
+                       'New Item': rng.choice(skus, size=400), 'layers': rng.integers(1, 13, size=400)})
+    df = df.groupby(['date', 'New Item'], as_index=False)['layers'].sum()
+    summary, daily = sc.evaluate(df)
+    print(summary.to_string())
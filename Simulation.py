@@ -0,0 +1,77 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Picking import Picking
+
+# PickingObj of the worker processes, which is shared once per worker instead of once per day
+_pko = None
+
+def _initWorker(pko):
+    global _pko
+    _pko = pko
+
+def _simulateDay(args):
+    date, df, engine, batching = args
+    pk = Picking(_pko, df, engine, batching=batching)
+    pk.picking()
+    return [date, sum(len(routes) for routes in pk.Routes), pk.travelDistance, df['layers'].sum()]
+
+
+class Simulation:
+    def __init__(self, pko, workers=1, engine='array', batching='greedy'):
+        self.pko = pko           # object created from (Class: PickingObj), with pair distances calculated
+        self.workers = workers   # number of processes to pick the days in parallel
+        self.engine = engine     # engine of (Class: Picking)
+        self.batching = batching # batching of (Class: Picking)
+
+    def simulateDays(self, df):
+        """
+        Pick the orders of each day (independently) and summarize the routes of each day
+        :param df: orders of many days as (pd.DataFrame) with the columns
+            |date      |Location   |layers|Class(optional)|
+            |----------|-----------|------|---------------|
+            |2022-02-23|801-01-A-01|3     |0              |
+            if 'Class' is not given, it is looked up from pko.posClsDict,
+            orders of locations not in the layout are ignored
+        :return: (pd.DataFrame) one row per day: date | routes | travel distance | layers
+        """
+        df = df.copy()
+        if 'Class' not in df.columns:
+            df['Class'] = df['Location'].map(self.pko.posClsDict)
+        df = df[df['Class'].notna()]
+        days = [(date, data, self.engine, self.batching) for date, data in df.groupby('date', sort=True)]
+
+        global _pko
+        if self.workers <= 1 or len(days) <= 1:
+            _pko = self.pko
+            rows = [_simulateDay(day) for day in days]
+        else:
+            # Forked workers inherit _pko from this process, otherwise it is pickled once per worker
+            ctx = multiprocessing.get_context()
+            if ctx.get_start_method() == 'fork':
+                _pko = self.pko
+                pool = ProcessPoolExecutor(self.workers, mp_context=ctx)
+            else:
+                pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_initWorker,
+                                           initargs=(self.pko,))
+            with pool:
+                chunksize = max(1, len(days) // (4 * self.workers))
+                rows = list(pool.map(_simulateDay, days, chunksize=chunksize))
+
+        result = pd.DataFrame(rows, columns=['date', 'routes', 'travel distance', 'layers'])
+        result['routes'] = result['routes'].astype(int)
+        return result
+
+
+if __name__ == '__main__':
+    from PickingObj import PickingObj
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir='layout.csv')
+    pko.getPosClass()
+    pko.getPairDistance()
+    rng = np.random.default_rng(0)
+    locs = rng.choice(pko.posKeys, size=400)
+    df = pd.DataFrame({'date': rng.choice(['2022-02-2' + str(d) for d in range(1, 8)], size=400),
+                       'Location': locs, 'layers': rng.integers(1, 13, size=400)})
+    df = df.drop_duplicates(['date', 'Location'])
+    print(Simulation(pko, workers=4).simulateDays(df))
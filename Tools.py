@@ -1,3 +1,5 @@
+import numpy as np
+
 class Tools:
     def xor(x, y):
         return bool((x and not y) or (not x and y))
@@ -14,4 +16,14 @@ class Tools:
         """
         if len(name) == 1: return '801-0' + str(name) + '-A-01'
         elif len(name) <= 3: return '801-' + str(name) + '-A-01'
-        else: return name
\ No newline at end of file
+        else: return name
+
+    def correctPosNames(names):
+        """
+        Vectorized version of Tools.correctPosName() for an array of names
+        :return: array of corrected names
+        """
+        names = np.asarray(names).astype(str)
+        lens = np.char.str_len(names)
+        return np.where(lens == 1, np.char.add(np.char.add('801-0', names), '-A-01'),
+               np.where(lens <= 3, np.char.add(np.char.add('801-', names), '-A-01'), names))
@@ -1,8 +1,5 @@
 import pandas as pd
-import matplotlib.patches as patches
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn
 from Tools import Tools
 
 class PalletPos:
@@ -19,8 +16,7 @@ class PalletPos:
         # SKU1   | name1
         # SKU2   | name2
         df = pd.read_csv(file)
-        for index, row in df.iterrows():
-            self.SKULocDict[str(row[1])] = row[0]
+        self.SKULocDict.update(zip(df.iloc[:, 1].astype(str), df.iloc[:, 0]))
 
     def ReadLocationFromCSV(self, file=None):
         # The .csv file should contain the name and location of each position in the following format
@@ -30,8 +26,7 @@ class PalletPos:
         # name2   | x2    | y2
 
         df = pd.read_csv(file)
-        for index, row in df.iterrows():
-            self.locDict[str(row[0])] = (row[1], row[2])
+        self.locDict.update(zip(df.iloc[:, 0].astype(str), zip(df.iloc[:, 1], df.iloc[:, 2])))
 
     def ReadFrequencyFromCSV(self, file=None):
         # The .csv file should contain the name and frequency of each position in the following format
@@ -41,99 +36,131 @@ class PalletPos:
         # name2   | # freq2
 
         df = pd.read_csv(file)
-        for index, row in df.iterrows():
-            self.freqDict[Tools.correctPosName(str(row[0]))] = row[1]
-        nanList = np.isnan(np.array(list(self.freqDict.values())))
-        keyList = list(self.freqDict.keys())
-        for i in range(len(nanList)):
-            if nanList[i]:
-                del self.freqDict[keyList[i]]
-
-
-    def _divideIntoClasses(self,arr,n_classes):
-        # Quantiles
-        classes = np.array([0]*len(arr))
-        Qs = [np.quantile(arr,(i+1)/n_classes) for i in range(n_classes)]
-        for i in range(n_classes):
-            index = n_classes-i-1
-            classes[arr < Qs[index]] = int(index)
+        self.freqDict.update(zip(Tools.correctPosNames(df.iloc[:, 0].astype(str)).tolist(), df.iloc[:, 1]))
+        self.freqDict = {pos: freq for pos, freq in self.freqDict.items() if not np.isnan(freq)}
+
+    def getLines(self):
+        # y values of the bottom and top lines, positions without location (nan) are not counted
+        ys = np.array(list(self.locDict.values()), dtype=float).reshape(-1, 2)[:, -1]
+        return np.nanmin(ys), np.nanmax(ys)
+
+    @staticmethod
+    def _divideIntoClasses(arr, n_classes):
+        # Quantiles: class of a value = first i with value < Qs[i], and 0 if none (e.g. the maximum)
+        arr = np.asarray(arr, dtype=float)
+        Qs = np.quantile(arr, np.arange(1, n_classes + 1) / n_classes)
+        classes = np.searchsorted(Qs, arr, side='right')
+        classes[classes == n_classes] = 0
         return classes
 
     def PlotLayout(self):
+        # Plotting libraries are only imported when plotting, so that batch jobs start fast
+        import matplotlib.pyplot as plt
+        from Render import Render
         fig, ax = plt.subplots(figsize=(15, 1.763))
         ax.set_xlim(-0.5, 411.5)
         ax.set_ylim(-0.5, 42.5)
         ax.set_xticks([])
         ax.set_yticks([])
-        w = 4.5
-        h = 4.5
 
         # self.locDict = {"Name of position": [x,y]}
         Positions = self.locDict
         posValues = np.array(list(Positions.values()))
-        ys = posValues[:,-1]
-        ymid = (np.min(ys) + np.max(ys)) / 2
-
-        for [x, y] in posValues:
-            height = h
-            # If in the middle line, height*2
-            if y == ymid:
-                height = 2*h
-            ax.add_patch(patches.Rectangle(
-                (x - 0.45*w, y - height/2),  # (x,y)
-                0.9*w, # width
-                height # height
-            ))
+        ymid = sum(self.getLines()) / 2
+
+        ax.add_collection(Render.getLayoutCollection(posValues, ymid))
         plt.show()
 
     def PlotHeatMap(self):
+        import matplotlib.pyplot as plt
+        import seaborn
+        from Render import Render
         fig, ax = plt.subplots(figsize=(15, 1.763))
         ax.set_xlim(-0.5, 411.5)
         ax.set_ylim(-0.5, 42.5)
         ax.set_xticks([])
         ax.set_yticks([])
-        w = 4.5
-        h = 4.5
 
         Positions = self.locDict
         Frequencies = self.freqDict
 
-        ys = np.array(list(Positions.values()))[:,-1]
-        ymid = (np.min(ys) + np.max(ys)) / 2
+        ymid = sum(self.getLines()) / 2
 
         freq = np.array(list(Frequencies.values()))
 
         n_classes = 7
-        color_class = self._divideIntoClasses(freq, n_classes)
+        color_class = dict(zip(Frequencies.keys(), self._divideIntoClasses(freq, n_classes)))
         colors = list(seaborn.color_palette("Reds", n_colors=n_classes))
 
+        posColors = []
         for pos in list(Positions.keys()):
-            [x, y] = Positions[pos]
-            color = 'grey'  # default
             if len(pos)==1:
                 pos = '801-0' + str(pos) + '-A-01'
             if len(pos)==2 or len(pos)==3:
                 pos = '801-' + str(pos) + '-A-01'
+            posColors.append(colors[color_class[pos]] if pos in color_class else 'grey')
 
-            try:
-                index = list(Frequencies.keys()).index(pos)
-                color = colors[color_class[index]]
-            except:
-                pass
-
-            height = h
-            # if middle row, h*2
-            if y == ymid:
-                height = 2 * h
-            ax.add_patch(patches.Rectangle(
-                (x - 0.45 * w, y - height / 2),  # (x,y)
-                0.9 * w,  # width
-                height,  # height
-                color = color
-            ))
+        ax.add_collection(Render.getLayoutCollection(list(Positions.values()), ymid, posColors))
         plt.show()
 
 
+class PosRegistry:
+    """
+    Dense integer IDs of the (corrected) names of pallet positions,
+    and the data of positions as arrays aligned with the IDs
+    """
+    def __init__(self, names=(), coords=None):
+        self._setNames(names)
+        if coords is not None:
+            self.coords = np.asarray(coords, dtype=float).reshape(len(self.names), 2)
+
+    def _setNames(self, names):
+        self.names = np.asarray(names).astype(str)    # names[ID] = PosName
+        self.index = pd.Index(self.names)             # for vectorized lookups of IDs
+        n = len(self.names)
+        self.coords = np.full((n, 2), np.nan)         # coords[ID] = [x, y]
+        self.freqs = np.full(n, np.nan)               # freqs[ID] = #freq (nan if unknown)
+        self.SKUs = np.full(n, '', dtype=object)      # SKUs[ID] = SKU stored in the position ('' if none)
+
+    def __len__(self):
+        return len(self.names)
+
+    def getIds(self, names):
+        """
+        :param names: array of (corrected) names of positions
+        :return: array of their IDs, -1 for names not in the registry
+        """
+        return self.index.get_indexer(np.asarray(names).astype(str))
+
+    def ReadLocationFromCSV(self, file=None, ifCorrectPosKeys=True):
+        # Same format as PalletPos.ReadLocationFromCSV(), one ID is given to each position
+        df = pd.read_csv(file)
+        names = df.iloc[:, 0].astype(str).values
+        if ifCorrectPosKeys:
+            names = Tools.correctPosNames(names)
+        coords = df.iloc[:, [1, 2]].values.astype(float)
+
+        # A duplicated name keeps its first place and its last location, same as PalletPos.locDict
+        uniqNames, first = np.unique(names, return_index=True)
+        _, last = np.unique(names[::-1], return_index=True)
+        order = np.argsort(first)
+        self._setNames(uniqNames[order])
+        self.coords = coords[len(names) - 1 - last[order]]
+
+    def ReadFrequencyFromCSV(self, file=None):
+        # Same format as PalletPos.ReadFrequencyFromCSV(), positions not in the registry are ignored
+        df = pd.read_csv(file)
+        ids = self.getIds(Tools.correctPosNames(df.iloc[:, 0].astype(str).values))
+        freqs = df.iloc[:, 1].values.astype(float)
+        self.freqs[ids[ids >= 0]] = freqs[ids >= 0]
+
+    def ReadSKUPositionFromCSV(self, file=None):
+        # Same format as PalletPos.ReadSKUPositionFromCSV(), positions not in the registry are ignored
+        df = pd.read_csv(file)
+        ids = self.getIds(Tools.correctPosNames(df.iloc[:, 0].astype(str).values))
+        self.SKUs[ids[ids >= 0]] = df.iloc[:, 1].astype(str).values[ids >= 0]
+
+
 if __name__ == '__main__':
     palletPos = PalletPos()
     palletPos.ReadLocationFromCSV('layout.csv')
@@ -0,0 +1,60 @@
+import os
+from itertools import permutations
+import numpy as np
+import pandas as pd
+import pytest
+from PickingObj import PickingObj
+from Picking import Picking
+from BatchRoute import BatchRoute
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def pko():
+    pko = PickingObj(aisles_x=[145.5, 265.5], layoutFileDir=os.path.join(HERE, 'layout.csv'))
+    pko.getPosClass()
+    pko.getPairDistance()
+    return pko
+
+
+def makeDay(pko, seed):
+    rng = np.random.default_rng(seed)
+    locs = rng.choice(pko.posKeys, size=int(rng.integers(20, 90)), replace=False)
+    df = pd.DataFrame({'Location': locs, 'layers': rng.integers(1, 13, size=len(locs))})
+    df['Class'] = df['Location'].map(pko.posClsDict)
+    return df
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_exactNotLongerThanGreedy(pko, seed):
+    df = makeDay(pko, seed)
+    greedy = Picking(pko, df.copy())
+    greedy.picking()
+    exact = Picking(pko, df.copy(), batching='exact')
+    exact.picking()
+    assert exact.travelDistance <= greedy.travelDistance + 1e-9
+    # Every layer is picked, by routes of at most 5 layers
+    layers = [l for layersCls in exact.getRouteLayers() for l in layersCls]
+    assert max(layers) <= 5
+    assert sum(layers) == df['layers'].sum()
+
+
+def test_batchRouteOptimal(pko):
+    # The route of a batch is the shortest path through its positions (all the orders tried)
+    batchRoute = BatchRoute(pko)
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        ids = rng.choice(pko.regionIds[0], size=4, replace=False)
+        distance, route = batchRoute.getRoute(0, ids)
+        names = pko.registry.names[ids].tolist()
+        assert len(route) == 3
+        assert distance == pytest.approx(sum(leg[3] for leg in route))
+        # Without fork pairs, the distance of a leg does not depend on the others
+        r = pko.regionIndex[ids]
+        if pko.forkPairMask[0][r[:, None], r[None, :]].any():
+            continue
+        dist = pko.pairDistMat[0][0][r[:, None], r[None, :]]
+        best = min(sum(dist[p[i], p[i+1]] for i in range(3)) for p in permutations(range(4)))
+        assert distance == pytest.approx(best)
+        assert {loc for leg in route for loc in leg[:2]} == set(names)
@@ -0,0 +1,126 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from PickingObj import PickingObj
+from Picking import Picking
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAYOUTS = {'layout.csv': [145.5, 265.5], 'layout_new.csv': [60.75, 145.5, 265.5, 332.25]}
+
+
+def getPko(layout):
+    pko = PickingObj(aisles_x=LAYOUTS[layout], layoutFileDir=os.path.join(HERE, layout))
+    pko.getPosClass()
+    return pko
+
+
+@pytest.fixture(scope='module')
+def pkos():
+    pkos = {layout: getPko(layout) for layout in LAYOUTS}
+    for pko in pkos.values():
+        pko.getPairDistance()
+    return pkos
+
+
+def makeDay(locs, classes, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Location': locs, 'layers': rng.integers(1, 13, size=len(locs)), 'Class': classes})
+
+
+def pickBoth(pko, df):
+    # Routes and travel distance of the day picked by both engines
+    result = []
+    for engine in ['array', 'pandas']:
+        pk = Picking(pko, df.copy(), engine)
+        pk.picking()
+        result.append((pk.Routes, pk.travelDistance))
+    return result
+
+
+def makeSeededDay(pko, seed):
+    # Same days as the ones of "test_Picking_baseline.json"
+    rng = np.random.default_rng(seed)
+    locs = rng.choice(pko.posKeys, size=int(rng.integers(20, 90)), replace=False)
+    df = pd.DataFrame({'Location': locs, 'layers': rng.integers(1, 13, size=len(locs))})
+    df['Class'] = df['Location'].map(pko.posClsDict)
+    return df
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_enginesSameAsBaseline(pkos, seed):
+    # Routes of the original Picking (before the engines) on "layout.csv"
+    with open(os.path.join(HERE, 'test_Picking_baseline.json')) as f:
+        baseline = json.load(f)['layout.csv'][str(seed)]
+    df = makeSeededDay(pkos['layout.csv'], seed)
+    for routes, distance in pickBoth(pkos['layout.csv'], df):
+        assert routes == baseline['Routes']
+        assert distance == pytest.approx(baseline['travelDistance'])
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_enginesSameRoutes(pkos, seed):
+    pko = pkos['layout_new.csv']
+    df = makeSeededDay(pko, seed)
+    (routes1, distance1), (routes2, distance2) = pickBoth(pko, df)
+    assert repr(routes1) == repr(routes2)
+    assert distance1 == distance2
+    assert distance1 > 0
+
+
+def test_enginesUnknownLocations(pkos):
+    # Day classed by "layout.csv" and picked in "layout_new.csv", where some of its locations are not
+    old, pko = getPko('layout.csv'), pkos['layout_new.csv']
+    unknown = sorted(set(old.posKeys) - set(pko.posKeys))
+    assert len(unknown) > 0
+    rng = np.random.default_rng(7)
+    known = [l for l in old.posKeys if l in pko.posClsDict]
+    locs = list(rng.choice(known, size=40, replace=False)) + unknown
+    df = makeDay(locs, [old.posClsDict[l] for l in locs], 7)
+    (routes1, distance1), (routes2, distance2) = pickBoth(pko, df)
+    assert repr(routes1) == repr(routes2)
+    assert distance1 == distance2
+    # Locations not in the layout have no pairs, their layers left are picked alone
+    left = dict(zip(df['Location'], df['layers'] % 5))
+    for routes in routes1:
+        for route in routes:
+            names = {name for leg in route for name in leg if isinstance(name, str)}
+            if names & set(unknown):
+                assert len(names) == 1
+    picked = {leg[0] for routes in routes1 for route in routes for leg in route if len(route) == 1}
+    assert {l for l in unknown if left[l] > 0} <= picked
+
+
+def test_routeTableUnknownLocations(pkos, tmp_path):
+    # Locations not in the layout keep their names in the route table and its .csv
+    old, pko = getPko('layout.csv'), pkos['layout_new.csv']
+    unknown = sorted(set(old.posKeys) - set(pko.posKeys))
+    known = [l for l in old.posKeys if l in pko.posClsDict]
+    locs = list(np.random.default_rng(1).choice(known, size=20, replace=False)) + unknown
+    df = makeDay(locs, [old.posClsDict[l] for l in locs], 1)
+    pk = Picking(pko, df)
+    pk.picking()
+    table = pk.routeTable
+    assert (table['from'] >= 0).any() and list(pk.unknownNames) == unknown
+    assert set(pk.unknownNames[-2 - table['from'][table['from'] < -1]]) == set(unknown)
+    fileDir = str(tmp_path / 'routes.csv')
+    pk.saveRouteTable(fileDir)
+    saved = pd.read_csv(fileDir, keep_default_na=False)
+    assert set(saved['from name']) | set(saved['to name']) == set(locs) | {''}
+    assert (saved.loc[saved['from'] >= 0, 'from name'] == pko.registry.names[table['from'][table['from'] >= 0]]).all()
+
+
+def test_routeLayersSameAsIntraday(pkos):
+    # A single wave planned by IntradayPlanner is picked like Picking, with the same layers per route
+    from Intraday import IntradayPlanner
+    pko = pkos['layout.csv']
+    df = makeSeededDay(pko, 3)
+    pk = Picking(pko, df.copy())
+    pk.picking()
+    planner = IntradayPlanner(pko)
+    planner.addLines(df)
+    planner.plan()
+    assert planner.getRoutes() == pk.Routes
+    assert [[sum(load.values()) for route, load in planned] for planned in planner.planned] == pk.getRouteLayers()
+    assert sum(map(sum, pk.getRouteLayers())) == df['layers'].sum()
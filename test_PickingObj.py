@@ -0,0 +1,157 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from PickingObj import PickingObj
+from Picking import Picking
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAYOUTS = {'layout.csv': [145.5, 265.5], 'layout_new.csv': [60.75, 145.5, 265.5, 332.25]}
+
+
+def getPko(layout, **kwargs):
+    pko = PickingObj(aisles_x=LAYOUTS[layout], layoutFileDir=os.path.join(HERE, layout))
+    pko.getPosClass()
+    pko.getPairDistance(**kwargs)
+    return pko
+
+
+def assertSamePairs(pko1, pko2):
+    assert len(pko1.posPairs) == len(pko2.posPairs)
+    for pairs1, pairs2 in zip(pko1.posPairs, pko2.posPairs):
+        assert list(pairs1.names) == list(pairs2.names)
+        assert np.array_equal(pairs1.idx1, pairs2.idx1) and np.array_equal(pairs1.idx2, pairs2.idx2)
+        assert np.array_equal(pairs1.forkLoc, pairs2.forkLoc)
+        assert np.array_equal(pairs1.distance, pairs2.distance, equal_nan=True)
+
+
+@pytest.mark.parametrize('layout', list(LAYOUTS))
+def test_vectorizeSameAsLoop(layout):
+    # Distances of all the pairs at once, the same as route by route through Route.getRoute()
+    pko, loop = getPko(layout), getPko(layout, ifVectorize=False)
+    assertSamePairs(pko, loop)
+    for dist, distLoop in zip(pko.pairDistMat, loop.pairDistMat):
+        assert np.array_equal(dist, distLoop, equal_nan=True)
+
+
+def test_cacheRoundTrip(tmp_path):
+    pko = getPko('layout.csv', cacheDir=str(tmp_path))
+    files = os.listdir(tmp_path)
+    assert len(files) == 1
+    # Loaded from the cache, not calculated again
+    cached = PickingObj(aisles_x=LAYOUTS['layout.csv'], layoutFileDir=os.path.join(HERE, 'layout.csv'))
+    cached.getPosClass()
+    assert cached._loadPairDistance(str(tmp_path))
+    assertSamePairs(pko, cached)
+    cached.getPairDistance(cacheDir=str(tmp_path))
+    assertSamePairs(pko, cached)
+    assert os.listdir(tmp_path) == files
+
+
+def test_cacheStale(tmp_path):
+    # A layout file changed (or other aisles) gives another key, so the cache is rebuilt, not loaded
+    layoutFileDir = str(tmp_path / 'layout.csv')
+    shutil.copy(os.path.join(HERE, 'layout.csv'), layoutFileDir)
+    cacheDir = str(tmp_path / 'cache')
+    pko = PickingObj(aisles_x=LAYOUTS['layout.csv'], layoutFileDir=layoutFileDir)
+    pko.getPosClass()
+    pko.getPairDistance(cacheDir=cacheDir)
+    oldFiles = os.listdir(cacheDir)
+    getPko('layout_new.csv', cacheDir=cacheDir) # cache of another layout file, kept
+
+    with open(layoutFileDir) as f:
+        lines = f.read().splitlines()
+    name, x, y = lines[1].split(',')
+    lines[1] = ','.join([name, str(float(x) + 4.5), y])
+    with open(layoutFileDir, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    moved = PickingObj(aisles_x=LAYOUTS['layout.csv'], layoutFileDir=layoutFileDir)
+    moved.getPosClass()
+    assert not moved._loadPairDistance(cacheDir)
+    moved.getPairDistance(cacheDir=cacheDir)
+    fresh = PickingObj(aisles_x=LAYOUTS['layout.csv'], layoutFileDir=layoutFileDir)
+    fresh.getPosClass()
+    fresh.getPairDistance()
+    assertSamePairs(moved, fresh)
+
+    # Only the last cache of the layout file is kept
+    files = os.listdir(cacheDir)
+    assert len(files) == 2 and oldFiles[0] not in files
+    assert sum(name.startswith('Pair_Distance_layout_new_') for name in files) == 1
+
+    # A cache with the name of the current one, but another key, is not loaded either
+    fileDir = moved._getCacheFileDir(cacheDir, moved._getCacheKey())
+    with np.load(fileDir) as data:
+        arrays = dict(data)
+    arrays['cacheKey'] = np.array('0' * 40)
+    with open(fileDir, 'wb') as f:
+        np.savez(f, **arrays)
+    assert not moved._loadPairDistance(cacheDir)
+
+
+@pytest.mark.parametrize('pruning', [{'kNearest': 5}, {'maxDistance': 60}])
+def test_prunedSameAsDense(pruning):
+    # Pairs pruned are calculated again when asked for, so the distances and routes stay the same
+    dense, pruned = getPko('layout.csv'), getPko('layout.csv', **pruning)
+    assert len(pruned.pairDistMat) == 0
+    for cls in range(len(dense.regionIds)):
+        n = len(dense.regionIds[cls])
+        idx1, idx2 = np.divmod(np.arange(n * n), n)
+        idx1, idx2 = idx1[idx1 != idx2], idx2[idx1 != idx2]
+        dist, isFork = pruned.getRegionDistances(cls, idx1, idx2)
+        assert np.array_equal(dist, dense.pairDistMat[cls][:, idx1, idx2])
+        assert np.array_equal(isFork, dense.forkPairMask[cls][idx1, idx2])
+    rng = np.random.default_rng(0)
+    for day in range(3):
+        locs = rng.choice(dense.posKeys, size=60, replace=False)
+        df = pd.DataFrame({'Location': locs, 'layers': rng.integers(1, 13, size=len(locs))})
+        df['Class'] = df['Location'].map(dense.posClsDict)
+        routes = []
+        for pko in [dense, pruned]:
+            pk = Picking(pko, df.copy())
+            pk.picking()
+            routes.append((pk.Routes, pk.travelDistance))
+        assert routes[0] == routes[1]
+
+
+def makeLayout(tmp_path, change):
+    # Copy of "layout.csv" with some positions moved, added or removed
+    df = pd.read_csv(os.path.join(HERE, 'layout.csv'))
+    if change == 'moved':
+        df.iloc[5, 1] += 4.5
+        df.iloc[100, 1] -= 9
+        df.iloc[150, 2] = 2.25
+    elif change == 'added':
+        df = pd.concat([df, pd.DataFrame([['801-99-A-01', 300.0, 2.25], ['801-98-A-01', 50.25, 21.0]],
+                                         columns=df.columns)])
+    elif change == 'removed':
+        df = df.drop([7, 180])
+    elif change == 'row':
+        df.iloc[5, 2] = 12.0 # a new row, between the others
+    fileDir = str(tmp_path / ('layout_' + change + '.csv'))
+    df.to_csv(fileDir, index=False)
+    return fileDir
+
+
+@pytest.mark.parametrize('backend', ['route', 'graph'])
+@pytest.mark.parametrize('change', ['moved', 'added', 'removed', 'row', 'aisles', 'boundary'])
+def test_updateLayoutSameAsFresh(tmp_path, backend, change):
+    pko = getPko('layout.csv', backend=backend)
+    layoutFileDir = makeLayout(tmp_path, change) if change in ('moved', 'added', 'removed', 'row') \
+        else os.path.join(HERE, 'layout.csv')
+    aisles_x = [145.5, 200.0, 265.5] if change == 'aisles' else LAYOUTS['layout.csv']
+    bondAisles_x = [190.5, 265.5] if change == 'boundary' else [145.5, 265.5]
+    info = pko.updateLayout(layoutFileDir, aisles_x, bondAisles_x)
+    assert info['full'] == (change == 'row' and backend == 'graph')
+
+    fresh = PickingObj(aisles_x=aisles_x, layoutFileDir=layoutFileDir, bondAisles_x=bondAisles_x)
+    fresh.getPosClass()
+    fresh.getPairDistance(backend=backend)
+    assert pko.posClsDict == fresh.posClsDict
+    assert len(pko.pairDistMat) == len(fresh.pairDistMat)
+    for cls in range(len(fresh.pairDistMat)):
+        assert list(pko.regionKeys[cls]) == list(fresh.regionKeys[cls])
+        assert np.array_equal(pko.pairDistMat[cls], fresh.pairDistMat[cls], equal_nan=True)
+        assert np.array_equal(pko.forkPairMask[cls], fresh.forkPairMask[cls])
+    assertSamePairs(pko, fresh)
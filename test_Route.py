@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from PickingObj import PickingObj
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def pko():
+    # "layout_new.csv" has positions without location
+    pko = PickingObj(aisles_x=[60.75, 145.5, 265.5, 332.25], layoutFileDir=os.path.join(HERE, 'layout_new.csv'))
+    pko.getPosClass()
+    pko.getPairDistance()
+    return pko
+
+
+def test_sameLinesAsRoute(pko):
+    assert np.isfinite([pko.ybot, pko.ytop]).all()
+    assert (pko.ybot, pko.ytop) == (pko.Route.ybot, pko.Route.ytop)
+
+
+def test_distanceSameAsPairs(pko):
+    # Route.getDistance() gives the distances of pko.posPairs (fork pairs start from the middle line)
+    ymid = (pko.ybot + pko.ytop) / 2
+    rng = np.random.default_rng(0)
+    for pairs in pko.posPairs:
+        for k in rng.choice(len(pairs), size=min(500, len(pairs)), replace=False).tolist():
+            (name1, name2), forkLoc, distance = pairs[k]
+            p1, p2 = pko.positions[name1], pko.positions[name2]
+            if p2[1] == ymid and p1[1] != ymid:
+                p1, p2 = p2, p1
+            d = pko.Route.getDistance(p1, p2, forkLoc=max(forkLoc, 0))[0]
+            assert d == distance or (np.isnan(d) and np.isnan(distance))
+
+
+def test_distanceMemo(pko):
+    Route = pko.Route
+    top, mid = Route.ytop, (Route.ybot + Route.ytop) / 2
+    # With lines not on the rows, the rows are all classed alike, but the distances are not the same
+    for y1 in [top, mid, top]:
+        pos1, pos2 = (100.5, y1), (110.25, Route.ybot)
+        route, forkLoc = Route.getRoute(pos1, pos2, 0, 50)
+        assert Route.getDistance(pos1, pos2, 0, 50)[0] == pytest.approx(Route.calculateRoute(np.array(route)))
+    # Positions without location are not memoized, lines without value are rejected
+    n = sum(len(cache) for cache in Route._distCache.values())
+    assert np.isnan(Route.getDistance((np.nan, np.nan), (110.25, top))[0])
+    assert sum(len(cache) for cache in Route._distCache.values()) == n
+    with pytest.raises(ValueError):
+        Route.getDistance((100.5, top), (110.25, top), np.nan, np.nan)
+
+
+def test_legPointsSameAsDistance(pko):
+    # The points of a leg (drawn by Render, driven by ForkliftSimulation) are the route of its distance
+    from Picking import Picking
+    rng = np.random.default_rng(0)
+    locs = rng.choice(pko.posKeys, size=60, replace=False)
+    df = pd.DataFrame({'Location': locs, 'layers': rng.integers(1, 5, size=len(locs))})
+    df['Class'] = df['Location'].map(pko.posClsDict)
+    pk = Picking(pko, df)
+    pk.picking()
+    legs = [leg for routes in pk.Routes for route in routes for leg in route if len(leg) == 4]
+    assert len(legs) > 0
+    for leg in legs:
+        points = np.array(pko.Route.getLegPoints(leg, pko.positions, pko.ybot, pko.ytop), dtype=float)
+        distance = pko.Route.calculateRoute(points)
+        assert distance == pytest.approx(leg[3]) or (np.isnan(distance) and np.isnan(leg[3]))